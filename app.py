@@ -4,6 +4,14 @@ import time
 import json
 import os
 import datetime
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
 
 # ==========================================
 # 1. CONFIGURATION
@@ -22,6 +30,7 @@ def calculate_hard_sell(price):
 DATA_DIR = "/app/data" if os.path.exists("/app/data") else "."
 STATE_FILE = os.path.join(DATA_DIR, "dashboard_state.json")
 STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.json")
 
 def load_json(filepath, retries=3):
     if not os.path.exists(filepath): return None
@@ -36,6 +45,67 @@ def load_json(filepath, retries=3):
             return None
     return None
 
+class DashboardFeed:
+    """
+    One loader shared by every viewer session.
+    Reloads a state file only when it changes on disk (watchdog events, or
+    1s mtime polling if watchdog is unavailable) and wakes waiting sessions.
+    """
+    def __init__(self, files):
+        self.files = files # name -> path
+        self.values = {name: load_json(path) for name, path in files.items()}
+        self.version = 0
+        self.changed = threading.Condition()
+        if Observer:
+            observer = Observer()
+            observer.schedule(_FeedHandler(self), DATA_DIR, recursive=False)
+            observer.daemon = True
+            observer.start()
+        else:
+            threading.Thread(target=self._poll, name="dashboard-poll", daemon=True).start()
+
+    def reload(self, path):
+        for name, p in self.files.items():
+            if os.path.abspath(p) != os.path.abspath(path): continue
+            value = load_json(p)
+            if value is None or value == self.values.get(name): return
+            with self.changed:
+                self.values[name] = value
+                self.version += 1
+                self.changed.notify_all()
+
+    def _poll(self):
+        mtimes = {}
+        while True:
+            for path in self.files.values():
+                try: m = os.path.getmtime(path)
+                except OSError: continue
+                if mtimes.get(path) != m:
+                    mtimes[path] = m
+                    self.reload(path)
+            time.sleep(1)
+
+    def wait(self, seen, timeout=30):
+        """Blocks until there is a version newer than `seen` (or timeout). Returns (version, values)."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != seen, timeout)
+            return self.version, dict(self.values)
+
+class _FeedHandler(FileSystemEventHandler):
+    def __init__(self, feed):
+        self.feed = feed
+
+    def on_any_event(self, event):
+        # Write-side events only (newer watchdog also reports opens, including our own reads)
+        if event.is_directory or event.event_type not in ("created", "modified", "moved", "closed"): return
+        # Atomic writers (tmp + os.replace) show up as moves onto the real file
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path and not path.endswith(".tmp"): self.feed.reload(path)
+
+@st.cache_resource
+def get_feed():
+    return DashboardFeed({"state": STATE_FILE, "stats": STATS_FILE, "metrics": METRICS_FILE})
+
 def format_signal(signal):
     s = str(signal).upper()
     if "ATTACK" in s or "BREAKOUT" in s: return "⚔️ BREAKOUT"
@@ -101,15 +171,16 @@ st.divider()
 # D. Logs Area
 st.subheader("📟 System Logs")
 logs_placeholder = st.empty()
+st.divider()
+
+# E. Telemetry Area
+st.subheader("⏱️ Loop Telemetry")
+telemetry_placeholder = st.empty()
 
 # ==========================================
-# 4. LIVE UPDATE LOOP
+# 4. SECTION RENDERERS
 # ==========================================
-while True:
-    data = load_json(STATE_FILE)
-    stats = load_json(STATS_FILE)
-    
-    # --- UPDATE SIDEBAR ---
+def render_sidebar(data, stats):
     with sidebar_placeholder.container():
         st.title("🛡️ Luma Guardian")
         
@@ -142,92 +213,151 @@ while True:
                         unsafe_allow_html=True
                     )
 
-    # --- UPDATE MAIN CONTENT ---
+def render_title(data):
     if data:
-        # Title
         mode = data.get('mode', 'STANDARD')
         title_placeholder.title(f"LUMA SINGULARITY COMMAND [{mode}]")
-
-        # A. Metrics
-        with metrics_placeholder.container():
-            c1, c2, c3, c4, c5 = st.columns(5)
-            c1.metric("Equity", f"${data.get('equity', 0):,.2f}")
-            c2.metric("Cash", f"${data.get('cash', 0):,.2f}")
-            c3.metric("PnL Season", f"${data.get('pnl', 0):,.2f}")
-            roe_val = data.get('account_roe', 0.0)
-            c4.metric("Account ROE", f"{roe_val:.2f}%", delta=roe_val)
-            c5.metric("Market Session", data.get('session', 'OFFLINE'))
-
-        # B. Scanner
-        with scanner_placeholder.container():
-            scan_raw = data.get('scan_results', [])
-            if scan_raw:
-                df = pd.DataFrame(scan_raw)
-                df['Symbol'] = df['coin']
-                df['Signal'] = df['quality'].apply(format_signal)
-                df['Price'] = df['price']
-                df['Hard Sell'] = df['price'].apply(calculate_hard_sell)
-                
-                st.dataframe(
-                    df[['Symbol', 'Signal', 'Price', 'Hard Sell']],
-                    column_config={
-                        "Symbol": st.column_config.TextColumn("Asset", width="small"),
-                        "Signal": st.column_config.TextColumn("Luma Signal", width="medium"),
-                        "Price": st.column_config.NumberColumn(format="$%.4f"),
-                        "Hard Sell": st.column_config.NumberColumn(format="$%.4f", help="-2% Liquid Projection"),
-                    },
-                    hide_index=True,
-                    width="stretch"
-                )
-            else:
-                st.info("Scanner initializing... Waiting for first pulse.")
-
-        # C. Positions
-        with positions_placeholder.container():
-            positions = data.get('positions', [])
-            secured_coins = data.get('secured_coins', [])
-            
-            if positions:
-                pos_df = pd.DataFrame(positions)
-                pos_df['Margin'] = (pos_df['entry'] * pos_df['size'].abs()) / 5
-                def safe_roe(row):
-                    if row['Margin'] == 0: return 0.0
-                    return (row['pnl'] / row['Margin']) * 100
-
-                pos_df['ROE'] = pos_df.apply(safe_roe, axis=1)
-                pos_df['Status'] = pos_df['coin'].apply(lambda x: "🔒 SECURED" if x in secured_coins else "🌊 RISK ON")
-
-                st.dataframe(
-                    pos_df,
-                    column_config={
-                        "coin": "Symbol",
-                        "Status": st.column_config.TextColumn("Risk Status", width="medium"),
-                        "Margin": st.column_config.NumberColumn("Margin ($)", format="$%.2f"),
-                        "size": st.column_config.NumberColumn("Size (Coins)", format="%.4f"),
-                        "entry": st.column_config.NumberColumn("Entry", format="$%.4f"),
-                        "pnl": st.column_config.NumberColumn("PnL ($)", format="$%.2f"),
-                        "ROE": st.column_config.NumberColumn("ROE (%)", format="%.2f %%"),
-                    },
-                    hide_index=True,
-                    width="stretch"
-                )
-            else:
-                st.write("No active positions.")
-
-        # D. Logs
-        with logs_placeholder.container():
-            logs = data.get('logs', [])
-            if logs:
-                log_content = "\n".join(logs[:50]) 
-                st.markdown(f'<div class="terminal-box">{log_content}</div>', unsafe_allow_html=True)
-            else:
-                st.text("Waiting for system logs...")
-
     else:
         # Fallback if file not ready yet
         title_placeholder.title("LUMA SINGULARITY COMMAND [BOOTING]")
+
+def render_metrics(data):
+    if not data:
         metrics_placeholder.warning("Connecting to Main Loop...")
+        return
+    with metrics_placeholder.container():
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Equity", f"${data.get('equity', 0):,.2f}")
+        c2.metric("Cash", f"${data.get('cash', 0):,.2f}")
+        c3.metric("PnL Season", f"${data.get('pnl', 0):,.2f}")
+        roe_val = data.get('account_roe', 0.0)
+        c4.metric("Account ROE", f"{roe_val:.2f}%", delta=roe_val)
+        c5.metric("Market Session", data.get('session', 'OFFLINE'))
+
+def render_scanner(data):
+    if not data: return
+    with scanner_placeholder.container():
+        scan_raw = data.get('scan_results', [])
+        if scan_raw:
+            df = pd.DataFrame(scan_raw)
+            df['Symbol'] = df['coin']
+            df['Signal'] = df['quality'].apply(format_signal)
+            df['Price'] = df['price']
+            df['Hard Sell'] = df['price'].apply(calculate_hard_sell)
+            
+            st.dataframe(
+                df[['Symbol', 'Signal', 'Price', 'Hard Sell']],
+                column_config={
+                    "Symbol": st.column_config.TextColumn("Asset", width="small"),
+                    "Signal": st.column_config.TextColumn("Luma Signal", width="medium"),
+                    "Price": st.column_config.NumberColumn(format="$%.4f"),
+                    "Hard Sell": st.column_config.NumberColumn(format="$%.4f", help="-2% Liquid Projection"),
+                },
+                hide_index=True,
+                width="stretch"
+            )
+        else:
+            st.info("Scanner initializing... Waiting for first pulse.")
+
+def render_positions(data):
+    if not data: return
+    with positions_placeholder.container():
+        positions = data.get('positions', [])
+        secured_coins = data.get('secured_coins', [])
+        
+        if positions:
+            pos_df = pd.DataFrame(positions)
+            pos_df['Margin'] = (pos_df['entry'] * pos_df['size'].abs()) / 5
+            def safe_roe(row):
+                if row['Margin'] == 0: return 0.0
+                return (row['pnl'] / row['Margin']) * 100
+
+            pos_df['ROE'] = pos_df.apply(safe_roe, axis=1)
+            pos_df['Status'] = pos_df['coin'].apply(lambda x: "🔒 SECURED" if x in secured_coins else "🌊 RISK ON")
+
+            st.dataframe(
+                pos_df,
+                column_config={
+                    "coin": "Symbol",
+                    "Status": st.column_config.TextColumn("Risk Status", width="medium"),
+                    "Margin": st.column_config.NumberColumn("Margin ($)", format="$%.2f"),
+                    "size": st.column_config.NumberColumn("Size (Coins)", format="%.4f"),
+                    "entry": st.column_config.NumberColumn("Entry", format="$%.4f"),
+                    "pnl": st.column_config.NumberColumn("PnL ($)", format="$%.2f"),
+                    "ROE": st.column_config.NumberColumn("ROE (%)", format="%.2f %%"),
+                },
+                hide_index=True,
+                width="stretch"
+            )
+        else:
+            st.write("No active positions.")
+
+def render_logs(data):
+    if not data: return
+    with logs_placeholder.container():
+        logs = data.get('logs', [])
+        if logs:
+            log_content = "\n".join(logs[:50]) 
+            st.markdown(f'<div class="terminal-box">{log_content}</div>', unsafe_allow_html=True)
+        else:
+            st.text("Waiting for system logs...")
+
+def render_telemetry(metrics):
+    with telemetry_placeholder.container():
+        if not metrics:
+            st.text("Waiting for metrics.json...")
+            return
+        spans = metrics.get('spans', {})
+        if spans:
+            span_df = pd.DataFrame([
+                {"Span": name, "Count": h['count'], "p50 (ms)": h['p50'], "p95 (ms)": h['p95'],
+                 "p99 (ms)": h['p99'], "Max (ms)": h['max']}
+                for name, h in spans.items()
+            ])
+            st.dataframe(span_df, hide_index=True, width="stretch")
+        counters = metrics.get('counters', {})
+        if counters:
+            st.caption(" | ".join(f"{k}: {v}" for k, v in counters.items()))
+        profile = metrics.get('profile')
+        if profile and profile.get('top'):
+            st.markdown(f"**Profiler** ({'running' if profile['running'] else 'stopped'}, {profile['samples']} samples)")
+            st.dataframe(pd.DataFrame(profile['top']), hide_index=True, width="stretch")
+
+# Section -> (inputs it depends on, renderer). A section redraws only when its inputs change.
+SECTIONS = {
+    "sidebar":   (lambda d, s: (bool(d), s),                                        lambda d, s: render_sidebar(d, s)),
+    "title":     (lambda d, s: d and d.get('mode'),                                  lambda d, s: render_title(d)),
+    "metrics":   (lambda d, s: d and [d.get(k) for k in ('equity', 'cash', 'pnl', 'account_roe', 'session')], lambda d, s: render_metrics(d)),
+    "scanner":   (lambda d, s: d and d.get('scan_results'),                          lambda d, s: render_scanner(d)),
+    "positions": (lambda d, s: d and [d.get('positions'), d.get('secured_coins')],   lambda d, s: render_positions(d)),
+    "logs":      (lambda d, s: d and d.get('logs'),                                  lambda d, s: render_logs(d)),
+}
+# Telemetry depends on metrics.json only (generated_at alone changing does not redraw)
+TELEMETRY_INPUTS = lambda m: m and [m.get(k) for k in ('spans', 'counters', 'gauges', 'profile')]
+
+def fingerprint(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+# ==========================================
+# 5. LIVE UPDATE LOOP (push-based)
+# ==========================================
+# Sessions sleep on the shared feed and wake only when main.py publishes
+# a new snapshot; the wait timeout keeps the browser connection alive.
+feed = get_feed()
+seen = -1
+rendered = {}
+while True:
+    seen, values = feed.wait(seen)
+    data, stats = values.get('state'), values.get('stats')
+
+    for name, (inputs, render) in SECTIONS.items():
+        fp = fingerprint(inputs(data, stats))
+        if rendered.get(name) == fp: continue
+        render(data, stats)
+        rendered[name] = fp
 
-    # Wait before next update inside the loop
-    # This keeps the browser connection open and avoids full page reload
-    time.sleep(1)
+    metrics = values.get('metrics')
+    fp = fingerprint(TELEMETRY_INPUTS(metrics))
+    if rendered.get("telemetry") != fp:
+        render_telemetry(metrics)
+        rendered["telemetry"] = fp
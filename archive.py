@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from candles import Candles
+
+# One fixed-width record per closed candle (48 bytes, little endian)
+RECORD = np.dtype([('t', '<i8'), ('o', '<f8'), ('h', '<f8'), ('l', '<f8'), ('c', '<f8'), ('v', '<f8')])
+
+INTERVAL_MS = {
+    "1m": 60 * 1000,
+    "5m": 5 * 60 * 1000,
+    "15m": 15 * 60 * 1000,
+    "30m": 30 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "4h": 4 * 60 * 60 * 1000,
+    "1d": 24 * 60 * 60 * 1000,
+}
+
+class CandleArchive:
+    """
+    Append-only local candle archive (one file per coin/interval on the data volume).
+    <COIN>_<interval>.bin holds fixed-width records sorted by time; a small
+    <COIN>_<interval>.idx.json holds the count and time range. Only closed bars
+    are written, so records never change once appended. Reads memory-map the
+    file and return Candles views over it (zero-copy).
+    Missing bars (downtime longer than a catch-up) are recorded in the index as
+    `gaps` ([last_t before, first_t after]); read(contiguous=True) returns only
+    the newest gap-free run.
+    """
+    MAX_GAPS = 100 # Newest gaps kept in the index
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.maps = {}  # key -> (record count, memmap)
+        self.index = {} # key -> index dict
+
+    def _paths(self, coin, interval):
+        base = os.path.join(self.root, f"{coin}_{interval}")
+        return base + ".bin", base + ".idx.json"
+
+    def _load_index(self, coin, interval):
+        key = (coin, interval)
+        if key in self.index: return self.index[key]
+        data_path, idx_path = self._paths(coin, interval)
+        idx = {"interval": interval, "count": 0, "first_t": None, "last_t": None, "record_size": RECORD.itemsize, "gaps": []}
+        if os.path.exists(data_path):
+            size = os.path.getsize(data_path)
+            if size % RECORD.itemsize:
+                # Torn write from a crash: drop the partial record
+                with open(data_path, 'r+b') as f: f.truncate(size - size % RECORD.itemsize)
+            records = self._map(coin, interval)
+            if len(records):
+                idx.update(count=len(records), first_t=int(records['t'][0]), last_t=int(records['t'][-1]),
+                           gaps=_gaps(records['t'], INTERVAL_MS.get(interval, 3600000))[-self.MAX_GAPS:])
+        self.index[key] = idx
+        return idx
+
+    def _write_index(self, coin, interval, idx):
+        _, idx_path = self._paths(coin, interval)
+        temp = idx_path + ".tmp"
+        with open(temp, 'w') as f: json.dump(idx, f)
+        os.replace(temp, idx_path)
+
+    def _map(self, coin, interval):
+        """Memory-mapped records (re-mapped when the file has grown)."""
+        key = (coin, interval)
+        data_path, _ = self._paths(coin, interval)
+        if not os.path.exists(data_path): return np.empty(0, dtype=RECORD)
+        count = os.path.getsize(data_path) // RECORD.itemsize
+        cached = self.maps.get(key)
+        if cached and cached[0] == count: return cached[1]
+        if count == 0: return np.empty(0, dtype=RECORD)
+        records = np.memmap(data_path, dtype=RECORD, mode='r', shape=(count,))
+        self.maps[key] = (count, records)
+        return records
+
+    # --- WRITE ---
+    def append(self, coin, interval, candles, now_ms=None):
+        """Appends closed bars newer than the last archived one. Returns the number written."""
+        if not candles: return 0
+        ms = INTERVAL_MS.get(interval, 3600000)
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self.lock:
+            idx = self._load_index(coin, interval)
+            t = candles.t
+            start = 0 if idx['last_t'] is None else int(np.searchsorted(t, idx['last_t'], side='right'))
+            end = int(np.searchsorted(t, now_ms - ms, side='right')) # Bars whose close time has passed
+            if end <= start: return 0
+
+            rows = np.empty(end - start, dtype=RECORD)
+            for k in RECORD.names: rows[k] = getattr(candles, k)[start:end]
+            prev = [] if idx['last_t'] is None else [idx['last_t']]
+            gaps = _gaps(np.concatenate([np.asarray(prev, dtype=np.int64), rows['t']]), ms)
+            if gaps:
+                idx['gaps'] = (idx.get('gaps', []) + gaps)[-self.MAX_GAPS:]
+                print(f">> ARCHIVE: {coin}/{interval} has {len(gaps)} gap(s), newest after {gaps[-1][0]}")
+            data_path, _ = self._paths(coin, interval)
+            with open(data_path, 'ab') as f:
+                f.write(rows.tobytes())
+
+            idx['count'] += len(rows)
+            if idx['first_t'] is None: idx['first_t'] = int(rows['t'][0])
+            idx['last_t'] = int(rows['t'][-1])
+            self._write_index(coin, interval, idx)
+            return len(rows)
+
+    # --- READ ---
+    def read(self, coin, interval, start=None, end=None, limit=None, contiguous=False):
+        """
+        Candles in [start, end] (ms), newest `limit` of them if given. Views over the mapped file.
+        contiguous: only the bars after the newest gap in that range.
+        """
+        with self.lock:
+            records = self._map(coin, interval)
+        if len(records) == 0: return Candles.empty()
+        t = records['t']
+        lo = 0 if start is None else int(np.searchsorted(t, start, side='left'))
+        hi = len(records) if end is None else int(np.searchsorted(t, end, side='right'))
+        if limit is not None: lo = max(lo, hi - limit)
+        if contiguous and hi - lo > 1:
+            breaks = np.flatnonzero(np.diff(t[lo:hi]) != INTERVAL_MS.get(interval, 3600000))
+            if len(breaks): lo += int(breaks[-1]) + 1
+        view = records[lo:hi]
+        return Candles(*(view[k] for k in RECORD.names))
+
+    def gaps(self, coin, interval):
+        """[[last_t before, first_t after], ...] for the newest gaps, oldest first."""
+        with self.lock:
+            return list(self._load_index(coin, interval).get('gaps', []))
+
+    def last_t(self, coin, interval):
+        with self.lock:
+            return self._load_index(coin, interval)['last_t']
+
+    def keys(self):
+        """(coin, interval) pairs present in the archive."""
+        out = []
+        for name in sorted(os.listdir(self.root)):
+            if name.endswith(".bin"):
+                coin, _, interval = name[:-4].rpartition("_")
+                out.append((coin, interval))
+        return out
+
+def _gaps(t, ms):
+    """[[before, after], ...] wherever consecutive times are not exactly one interval apart."""
+    if len(t) < 2: return []
+    breaks = np.flatnonzero(np.diff(t) != ms)
+    return [[int(t[i]), int(t[i + 1])] for i in breaks]
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+
+MAX_PERP_DECIMALS = 6 # Hyperliquid: perp prices use at most (6 - szDecimals) decimals
+
+class Atlas:
+    """
+    Asset metadata index (size decimals, price decimals, max leverage) built
+    from the exchange `meta` response and keyed by coin for O(1) lookups.
+    Cached on the data volume with a TTL; refresh() is run every
+    `refresh_every` seconds by the chronos Scheduler, so new coins need no
+    code change.
+    """
+    def __init__(self, fetch_meta, path=None, ttl=6 * 3600, refresh_every=3600):
+        print(">> Atlas (Asset Index) Loaded")
+        self.fetch_meta = fetch_meta # e.g. Vision.get_meta
+        self.path = path
+        self.ttl = ttl
+        self.refresh_every = refresh_every
+        self.assets = {}
+        self.fetched_at = 0.0
+
+        cached = self._load()
+        if not cached or time.time() - self.fetched_at > self.ttl:
+            self.refresh()
+
+    # --- LOOKUPS ---
+    def get(self, coin):
+        return self.assets.get(coin)
+
+    def precision(self, coin):
+        """(price decimals, size decimals) or None if the coin is unknown."""
+        a = self.assets.get(coin)
+        if not a: return None
+        return (a['px_decimals'], a['sz_decimals'])
+
+    def max_leverage(self, coin, default=None):
+        a = self.assets.get(coin)
+        return a['max_leverage'] if a else default
+
+    def round_size(self, coin, size):
+        """Order size rounded to the coin's size decimals, or None if the coin is unknown."""
+        a = self.assets.get(coin)
+        if not a: return None
+        if a['sz_decimals'] == 0: return float(int(size))
+        return round(float(size), a['sz_decimals'])
+
+    def round_price(self, coin, price):
+        """Valid order price: 5 significant figures, at most px_decimals decimals."""
+        a = self.assets.get(coin)
+        if not a: return None
+        if price >= 100000: return float(round(price))
+        return round(float(f"{price:.5g}"), a['px_decimals'])
+
+    # --- REFRESH ---
+    def refresh(self):
+        try:
+            meta = self.fetch_meta()
+            universe = (meta or {}).get("universe", [])
+            if not universe: return False
+
+            assets = {}
+            for i, u in enumerate(universe):
+                sz_dec = int(u.get("szDecimals", 0))
+                assets[u["name"]] = {
+                    "index": i,
+                    "sz_decimals": sz_dec,
+                    "px_decimals": max(MAX_PERP_DECIMALS - sz_dec, 0),
+                    "max_leverage": int(u.get("maxLeverage", 1)),
+                    "only_isolated": bool(u.get("onlyIsolated", False)),
+                    "delisted": bool(u.get("isDelisted", False)),
+                }
+            self.assets = assets
+            self.fetched_at = time.time()
+            self._save()
+            print(f">> ATLAS: Indexed {len(assets)} assets")
+            return True
+        except Exception as e:
+            print(f"xx ATLAS REFRESH FAILED: {e}")
+            return False
+
+    # --- DISK CACHE ---
+    def _load(self):
+        if not self.path or not os.path.exists(self.path): return False
+        try:
+            with open(self.path, 'r') as f: raw = json.load(f)
+            self.assets = raw.get("assets", {})
+            self.fetched_at = raw.get("fetched_at", 0.0)
+            return bool(self.assets)
+        except Exception:
+            return False
+
+    def _save(self):
+        if not self.path: return
+        try:
+            temp = self.path + ".tmp"
+            with open(temp, 'w') as f: json.dump({"fetched_at": self.fetched_at, "assets": self.assets}, f)
+            os.replace(temp, self.path)
+        except Exception as e:
+            print(f"xx ATLAS SAVE FAILED: {e}")
@@ -0,0 +1,291 @@
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import indicators
+from archive import CandleArchive
+from candles import Candles
+from deep_sea import DeepSea
+from fleet import FLEET_CONFIG, STARTING_EQUITY, scan_coin
+from smart_money import SmartMoney
+from xenomorph import Xenomorph
+
+# ==============================================================================
+#  LUMA BACKTEST
+#  Replays stored candles through the live organs (scan_coin -> SmartMoney /
+#  Xenomorph, DeepSea ratchet) bar by bar, with simulated fills and fees.
+# ==============================================================================
+
+WINDOW = 70 # Same window the live scanner sees
+
+DEFAULT_PARAMS = {
+    "starting_equity": STARTING_EQUITY,
+    "fee": 0.00045,      # Taker fee (per side)
+    "slippage": 0.0005,  # Market order slippage (per side)
+    # DeepSea overrides (None = live values)
+    "hard_stops": None,
+    "trail_gap": None,
+    "trail_steps": None,
+    "breakeven_roi": None,
+}
+
+# ==========================================
+# DATA
+# ==========================================
+def load_candles(path):
+    """Loads a candle file: JSON list of candle rows, or CSV with t,o,h,l,c,v columns."""
+    if path.endswith(".csv"):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        for r in rows: r['t'] = int(float(r['t']))
+    else:
+        with open(path, 'r') as f:
+            rows = json.load(f)
+    rows.sort(key=lambda r: r['t'])
+    return Candles.from_rows(rows)
+
+def load_fleet(data_dir, interval="15m", coins=None):
+    """
+    Loads {coin: Candles} from <data_dir>: a CandleArchive (<COIN>_<interval>.bin,
+    memory-mapped) or plain <COIN>_<interval>.json|.csv files.
+    Archives with gaps (bot downtime) are cut to their newest gap-free run,
+    since the simulation steps bar by bar.
+    """
+    out = {}
+    archive = None
+    for coin in (coins or FLEET_CONFIG):
+        if os.path.exists(os.path.join(data_dir, f"{coin}_{interval}.bin")):
+            archive = archive or CandleArchive(data_dir)
+            out[coin] = archive.read(coin, interval, contiguous=True)
+            gaps = archive.gaps(coin, interval)
+            if gaps: print(f">> {coin}: archive has {len(gaps)} gap(s); using the {len(out[coin])} bars after the last one")
+            continue
+        for ext in (".json", ".csv"):
+            path = os.path.join(data_dir, f"{coin}_{interval}{ext}")
+            if os.path.exists(path):
+                out[coin] = load_candles(path)
+                break
+    return out
+
+# ==========================================
+# SIMULATED EXECUTION
+# ==========================================
+class SimHands:
+    """Stands in for Hands: fills market orders at the current bar close."""
+    def __init__(self, params, fleet_config):
+        self.fee = params['fee']
+        self.slippage = params['slippage']
+        self.fleet_config = fleet_config
+        self.cash = params['starting_equity'] # Realized equity
+        self.positions = {}  # coin -> {"size", "entry", "margin", "signal"}
+        self.marks = {}      # coin -> latest close
+        self.trades = []
+        self.fees = 0.0
+        self.now = 0
+        self.wallet_address = "backtest"
+
+    def place_market_order(self, coin, side, size, reduce_only=False, signal=None):
+        price = self.marks.get(coin)
+        if not price: return
+        is_buy = side == "BUY"
+        fill = price * (1 + self.slippage) if is_buy else price * (1 - self.slippage)
+
+        if reduce_only:
+            pos = self.positions.pop(coin, None)
+            if not pos: return
+            qty = min(abs(size), abs(pos['size']))
+            fee = qty * fill * self.fee
+            pnl = (fill - pos['entry']) * qty * (1 if pos['size'] > 0 else -1) - fee
+            self.cash += pnl
+            self.fees += fee
+            self.trades.append({
+                "coin": coin, "signal": pos['signal'], "pnl": pnl + pos['entry_fee'],
+                "roi": (pnl + pos['entry_fee']) / pos['margin'] * 100 if pos['margin'] else 0.0,
+                "opened": pos['opened'], "closed": self.now
+            })
+            return
+
+        # Entry: `size` is USD notional (same as live Hands)
+        if coin in self.positions: return
+        qty = size / fill
+        fee = size * self.fee
+        lev = self.fleet_config.get(coin, {}).get('lev', 5)
+        self.cash -= fee
+        self.fees += fee
+        self.positions[coin] = {
+            "size": qty if is_buy else -qty, "entry": fill, "margin": size / lev,
+            "signal": signal, "entry_fee": -fee, "opened": self.now
+        }
+
+    def close_positions(self, exits):
+        out = {}
+        for coin, side, size, _ in exits:
+            held = coin in self.positions
+            self.place_market_order(coin, side, size, reduce_only=True)
+            filled = held and coin not in self.positions
+            out[coin] = {"status": "filled" if filled else "failed", "accepted": filled}
+        return out
+
+    def snapshot_positions(self):
+        """Positions in the shape main.py builds from the clearinghouse state."""
+        out = []
+        for coin, pos in self.positions.items():
+            mark = self.marks.get(coin, pos['entry'])
+            out.append({
+                "coin": coin, "size": pos['size'], "entry": pos['entry'],
+                "pnl": (mark - pos['entry']) * pos['size'], "margin": pos['margin']
+            })
+        return out
+
+    def equity(self):
+        return self.cash + sum(p['pnl'] for p in self.snapshot_positions())
+
+# ==========================================
+# ENGINE
+# ==========================================
+def _configure_deep_sea(deep_sea, params):
+    if params.get('hard_stops') is not None: deep_sea.HARD_STOPS = dict(params['hard_stops'])
+    if params.get('trail_gap') is not None: deep_sea.TRAIL_GAP = params['trail_gap']
+    if params.get('trail_steps') is not None: deep_sea.TRAIL_STEPS = [tuple(s) for s in params['trail_steps']]
+    if params.get('breakeven_roi') is not None: deep_sea.BREAKEVEN_ROI = params['breakeven_roi']
+
+def run_backtest(fleet, params=None, fleet_config=None, interval="15m"):
+    """
+    Replays {coin: Candles} in time order.
+    Each bar: score every coin whose bar closed (live scanner rules), then run
+    DeepSea against positions marked at that close.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    fleet_config = fleet_config or FLEET_CONFIG
+    started = time.time()
+
+    smart_money = SmartMoney()
+    xenomorph = Xenomorph()
+    deep_sea = DeepSea(persist=False)
+    _configure_deep_sea(deep_sea, params)
+    bank = indicators.IndicatorBank(None)
+    hands = SimHands(params, fleet_config)
+
+    # Merged timeline: for each timestamp, the bar index of every coin that has one
+    timeline = np.unique(np.concatenate([c.t for c in fleet.values()])) if fleet else []
+    cursors = {coin: 0 for coin in fleet}
+    curve = []
+
+    for ts in timeline:
+        hands.now = int(ts)
+        for coin, candles in fleet.items():
+            i = cursors[coin]
+            if i >= len(candles) or candles.t[i] != ts: continue
+            cursors[coin] = i + 1
+            hands.marks[coin] = float(candles.c[i])
+            if i + 1 < WINDOW: continue
+
+            window = candles[i + 1 - WINDOW:i + 1]
+            result = scan_coin(coin, window, smart_money, xenomorph, bank,
+                               coin_type=fleet_config.get(coin, {}).get('type', 'MEME'))
+            if not result: continue
+
+            quality = str(result['quality'])
+            is_buy = "BUY" in quality or "BREAKOUT" in quality
+            is_sell = "SELL" in quality
+            if not (is_buy or is_sell) or coin in hands.positions: continue
+
+            alloc_size_usd = smart_money.calculate_position_size(hands.equity(), slots=len(fleet_config))
+            if alloc_size_usd > 5:
+                hands.place_market_order(coin, "BUY" if is_buy else "SELL", alloc_size_usd, signal=quality)
+
+        if hands.positions:
+            deep_sea.manage_positions(hands, hands.snapshot_positions(), fleet_config, None)
+        curve.append(hands.equity())
+
+    # Close anything still open at the last mark
+    for coin, pos in list(hands.positions.items()):
+        hands.place_market_order(coin, "SELL" if pos['size'] > 0 else "BUY", abs(pos['size']), reduce_only=True)
+
+    return summarize(hands, curve, params, bars=sum(len(c) for c in fleet.values()), elapsed=time.time() - started)
+
+def summarize(hands, curve, params, bars=0, elapsed=0.0):
+    trades = hands.trades
+    wins = [t for t in trades if t['pnl'] > 0]
+    curve = np.asarray(curve if curve else [params['starting_equity']], dtype=np.float64)
+    peak = np.maximum.accumulate(curve)
+    max_dd = float(((peak - curve) / peak).max() * 100) if len(curve) else 0.0
+
+    by_coin, by_signal = {}, {}
+    for t in trades:
+        for bucket, key in ((by_coin, t['coin']), (by_signal, t['signal'] or "UNKNOWN")):
+            row = bucket.setdefault(key, {"trades": 0, "wins": 0, "pnl": 0.0})
+            row['trades'] += 1
+            row['wins'] += 1 if t['pnl'] > 0 else 0
+            row['pnl'] = round(row['pnl'] + t['pnl'], 2)
+
+    return {
+        "params": {k: v for k, v in params.items() if v is not None},
+        "final_equity": round(hands.cash, 2),
+        "pnl": round(hands.cash - params['starting_equity'], 2),
+        "trades": len(trades),
+        "wins": len(wins),
+        "losses": len(trades) - len(wins),
+        "win_rate": round(len(wins) / len(trades) * 100, 1) if trades else 0.0,
+        "avg_roi": round(float(np.mean([t['roi'] for t in trades])), 2) if trades else 0.0,
+        "fees": round(hands.fees, 2),
+        "max_drawdown": round(max_dd, 2),
+        "by_coin": by_coin,
+        "by_signal": by_signal,
+        "bars": bars,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+# ==========================================
+# PARAMETER SWEEPS (process pool)
+# ==========================================
+_WORKER_FLEET = None
+
+def _init_worker(data_dir, interval):
+    global _WORKER_FLEET
+    _WORKER_FLEET = load_fleet(data_dir, interval)
+
+def _run_worker(params):
+    # Organ chatter from hundreds of runs is noise; only the summaries matter
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return run_backtest(_WORKER_FLEET, params)
+
+def sweep(data_dir, grid, interval="15m", workers=None):
+    """
+    Runs every combination in `grid` ({param: [values]}) across a process pool.
+    Each worker loads the candle files once. Results are sorted by PnL.
+    """
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir, interval)) as pool:
+        results = list(pool.map(_run_worker, combos))
+    return sorted(results, key=lambda r: r['pnl'], reverse=True)
+
+# ==========================================
+# CLI
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay stored candles through the Luma organs.")
+    parser.add_argument("--data", default="candles", help="Candle archive directory, or <COIN>_<interval>.json|.csv files")
+    parser.add_argument("--interval", default="15m")
+    parser.add_argument("--sweep", help="JSON grid, e.g. '{\"trail_gap\": [2.0, 3.0]}'")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.sweep:
+        results = sweep(args.data, json.loads(args.sweep), args.interval, args.workers)
+        for r in results:
+            print(f">> PnL ${r['pnl']:>9.2f} | WR {r['win_rate']:>5.1f}% | Trades {r['trades']:>4} | DD {r['max_drawdown']:.1f}% | {r['params']}")
+    else:
+        fleet = load_fleet(args.data, args.interval)
+        if not fleet:
+            print(f"xx BACKTEST: No candle files in {args.data}")
+        else:
+            print(json.dumps(run_backtest(fleet), indent=4))
@@ -0,0 +1,82 @@
+import numpy as np
+from collections.abc import Mapping
+
+FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+
+class CandleView(Mapping):
+    """Read-only dict-style view of one bar (backward compatible with candle dicts)."""
+    __slots__ = ('_candles', '_i')
+
+    def __init__(self, candles, i):
+        self._candles = candles
+        self._i = i
+
+    def __getitem__(self, key):
+        if key == 't': return int(self._candles.t[self._i])
+        if key in FIELDS: return float(getattr(self._candles, key)[self._i])
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class Candles:
+    """
+    Columnar OHLCV series: float64 arrays for o/h/l/c/v and an int64 time
+    array (oldest first). Arrays are contiguous when parsed from the API and
+    strided views when read from the memory-mapped archive. Slicing returns
+    views, not copies.
+    Integer indexing returns a dict-style CandleView, so code written for
+    lists of candle dicts keeps working.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, t, o, h, l, c, v):
+        self.t = np.asarray(t, dtype=np.int64)
+        self.o = np.asarray(o, dtype=np.float64)
+        self.h = np.asarray(h, dtype=np.float64)
+        self.l = np.asarray(l, dtype=np.float64)
+        self.c = np.asarray(c, dtype=np.float64)
+        self.v = np.asarray(v, dtype=np.float64)
+
+    @classmethod
+    def empty(cls):
+        return cls(*([],) * len(FIELDS))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds from candle dicts (API rows with string prices are fine)."""
+        n = len(rows)
+        t = np.fromiter((r['t'] for r in rows), dtype=np.int64, count=n)
+        cols = [np.fromiter((float(r[k]) for r in rows), dtype=np.float64, count=n) for k in FIELDS[1:]]
+        return cls(t, *cols)
+
+    def __len__(self):
+        return self.t.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Candles(self.t[key], self.o[key], self.h[key], self.l[key], self.c[key], self.v[key])
+        n = self.t.shape[0]
+        if key < 0: key += n
+        if not 0 <= key < n: raise IndexError("candle index out of range")
+        return CandleView(self, key)
+
+    def __iter__(self):
+        for i in range(len(self.t)):
+            yield CandleView(self, i)
+
+    def __repr__(self):
+        return f"<Candles n={len(self)}>"
+
+    def concat(self, other):
+        return Candles(*(np.concatenate((getattr(self, k), getattr(other, k))) for k in FIELDS))
+
+    def to_rows(self):
+        """Plain list of candle dicts (for JSON, logs, etc)."""
+        return [dict(view) for view in self]
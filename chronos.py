@@ -1,4 +1,10 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from archive import INTERVAL_MS
+from telemetry import METRICS
 
 class Chronos:
     def __init__(self):
@@ -25,3 +31,163 @@ class Chronos:
         # Returns True if mostly liquid (skips weekend dead zones if needed)
         # For Crypto, we run 24/7, but we respect the Volume Sessions above.
         return True
+
+def once(*events):
+    """Scheduler.watch() predicate: True once per set() of any of the threading.Events."""
+    def fired():
+        hit = False
+        for ev in events:
+            if ev.is_set():
+                ev.clear()
+                hit = True
+        return hit
+    return fired
+
+class Scheduler:
+    """
+    Event-driven tick source for the main loop.
+    wait() blocks until something worth reacting to happens and returns
+    {"reasons": [...], "coins": [...], "closed": bool} - the coins that need a
+    fresh scan, and whether a candle just closed (judge that bar, not the new one):
+      * candle close: a bar closed on a watched interval -> every coin
+      * price move:   a mid moved >= move_pct % since that coin was last scanned
+      * watch():      a predicate fired (e.g. a fill or an exit changed positions) -> every coin
+      * heartbeat:    nothing happened for `max_idle` seconds -> account/dashboard refresh only
+                      (blind: while prices_live() is False moves can't be seen, so every
+                      `blind_idle` seconds -> every coin, paced to the REST budget)
+    Housekeeping jobs (every()) run on their own cadence on a small pool;
+    a run that exceeds its deadline is reported and never overlapped.
+    """
+    def __init__(self, coins, prices=None, prices_live=None, intervals=("15m",), move_pct=0.3,
+                 max_idle=15.0, blind_idle=3.0, min_gap=1.0, close_settle=2.0, job_workers=2):
+        print(">> Chronos Scheduler Loaded")
+        self.coins = list(coins)
+        self.prices = prices # PriceCache-like: get(coin, max_age) and wait(timeout)
+        self.prices_live = prices_live # Callable: is `prices` being fed continuously?
+        self.intervals = list(intervals)
+        self.move_pct = move_pct
+        self.max_idle = max_idle
+        self.blind_idle = blind_idle
+        self.min_gap = min_gap
+        self.close_settle = close_settle # Seconds after the close before the bar is final on the exchange
+
+        now = time.time()
+        self.next_close = {i: self._next_boundary(i, now) for i in self.intervals}
+        self.scan_prices = {} # coin -> mid at its last scan
+        self.watches = {}     # name -> predicate
+        self.last_tick = 0.0  # 0 = boot: first wait() returns immediately
+
+        self.jobs = {}
+        self.job_pool = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="chronos")
+        self.jobs_running = False
+
+    # --- TRIGGERS ---
+    def _next_boundary(self, interval, now):
+        ms = INTERVAL_MS.get(interval, 3600000)
+        return (math.floor(now * 1000 / ms) + 1) * ms / 1000 + self.close_settle
+
+    def watch(self, name, predicate):
+        """Triggers a full scan whenever predicate() is truthy."""
+        self.watches[name] = predicate
+
+    def scanned(self, prices):
+        """Records the price each coin was scanned at ({coin: price})."""
+        self.scan_prices.update(prices)
+
+    def _check(self, now):
+        reasons, coins = [], set()
+        for interval, at in self.next_close.items():
+            if now >= at:
+                reasons.append(f"candle_close:{interval}")
+                coins.update(self.coins)
+                self.next_close[interval] = self._next_boundary(interval, now)
+        for name, predicate in self.watches.items():
+            try:
+                if predicate():
+                    reasons.append(name)
+                    coins.update(self.coins)
+            except Exception as e:
+                print(f"xx SCHEDULER WATCH {name}: {e}")
+        if self.prices:
+            for coin in self.coins:
+                last = self.scan_prices.get(coin)
+                px = self.prices.get(coin, 5.0)
+                if last and px and abs(px / last - 1) * 100 >= self.move_pct:
+                    reasons.append(f"move:{coin}")
+                    coins.add(coin)
+        if not self.last_tick:
+            reasons.append("boot")
+            coins.update(self.coins)
+        elif not reasons and not self._live() and now - self.last_tick >= self._idle():
+            reasons.append("blind")
+            coins.update(self.coins)
+        elif not reasons and now - self.last_tick >= self.max_idle:
+            reasons.append("heartbeat")
+        return reasons, coins
+
+    def _live(self):
+        if not self.prices_live: return bool(self.prices)
+        try: return bool(self.prices_live())
+        except Exception: return False
+
+    def _idle(self):
+        return self.max_idle if self._live() else min(self.max_idle, self.blind_idle)
+
+    def wait(self, timeout=None):
+        """Blocks until the next trigger (or `timeout`). Returns None on timeout."""
+        end = time.time() + timeout if timeout else None
+        gap = self.last_tick + self.min_gap - time.time()
+        if gap > 0: time.sleep(gap) # Debounce: bursts of events become one tick
+        while True:
+            now = time.time()
+            reasons, coins = self._check(now)
+            if reasons:
+                self.last_tick = now
+                for r in reasons: METRICS.incr(f"scheduler.{r.split(':')[0]}")
+                return {"reasons": reasons, "coins": [c for c in self.coins if c in coins],
+                        "closed": any(r.startswith("candle_close") for r in reasons)}
+            if end and now >= end: return None
+            pause = min(next_at - now for next_at in self.next_close.values()) if self.next_close else 1.0
+            pause = max(0.05, min(pause, 1.0, self.last_tick + self._idle() - now))
+            if self.prices: self.prices.wait(pause) # Wakes on price updates
+            else: time.sleep(pause)
+
+    # --- HOUSEKEEPING ---
+    def every(self, name, period, fn, deadline=None, run_now=False):
+        """Runs fn() every `period` seconds off the main thread. `deadline` defaults to the period."""
+        self.jobs[name] = {
+            "period": period, "fn": fn, "deadline": deadline or period,
+            "next": time.time() if run_now else time.time() + period,
+            "future": None, "started": 0.0, "overrun": False
+        }
+
+    def start_jobs(self):
+        if self.jobs_running: return
+        self.jobs_running = True
+        threading.Thread(target=self._job_loop, name="chronos-jobs", daemon=True).start()
+
+    def _job_loop(self):
+        while self.jobs_running:
+            now = time.time()
+            for name, job in self.jobs.items():
+                future = job['future']
+                if future and not future.done():
+                    if not job['overrun'] and now - job['started'] > job['deadline']:
+                        job['overrun'] = True # Report once; never start a second copy
+                        METRICS.incr(f"job.{name}.overrun")
+                        print(f"xx JOB OVERRUN: {name} running {now - job['started']:.1f}s (deadline {job['deadline']}s)")
+                    continue
+                if now >= job['next']:
+                    job['next'] = now + job['period']
+                    job['started'] = now
+                    job['overrun'] = False
+                    job['future'] = self.job_pool.submit(self._run_job, name, job['fn'])
+            time.sleep(0.5)
+
+    def _run_job(self, name, fn):
+        try:
+            with METRICS.span(f"job.{name}"):
+                fn()
+        except Exception as e:
+            METRICS.incr(f"job.{name}.errors")
+            print(f"xx JOB {name} FAILED: {e}")
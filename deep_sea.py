@@ -1,59 +1,221 @@
 import json
 import os
+import queue
+import threading
 import time
-from datetime import datetime
+from journal import TradeJournal
+from telemetry import METRICS
 
 class DeepSea:
-    def __init__(self):
+    # Ratchet Parameters (ROI %). Instance overrides are used by backtest sweeps.
+    HARD_STOPS = {"PRINCE": -6.0, "MEME": -8.0}
+    TRAIL_GAP = 3.0                          # Default Trail
+    TRAIL_STEPS = [(5.0, 1.5), (12.0, 0.5)]  # (High Water ROI >=, Tighter Gap)
+    BREAKEVEN_ROI = 0.40
+    CHECKPOINT_EVERY = 2.0 # Min seconds between ratchet_state.json writes (only when something changed)
+
+    def __init__(self, data_dir=None, persist=True):
         print(">> DEEP SEA: Stepped Trailing Logic Loaded")
         
         # [PATCH] Align with Railway Directory Logic
-        self.DATA_DIR = "/app/data" if os.path.exists("/app/data") else "."
+        self.DATA_DIR = data_dir or ("/app/data" if os.path.exists("/app/data") else ".")
         if not os.path.exists(self.DATA_DIR): os.makedirs(self.DATA_DIR, exist_ok=True)
             
-        self.STATS_FILE = os.path.join(self.DATA_DIR, "stats.json")
+        self.RATCHET_FILE = os.path.join(self.DATA_DIR, "ratchet_state.json")
+        self.persist = persist # False = in-memory only (backtests)
         
         self.secured_coins = []
         self.highest_rois = {} # Tracks highest ROI % seen (not price)
-        self.stats = self._load_stats()
-
-    def _load_stats(self):
-        """STABILITY PATCH: Safe Load"""
-        if os.path.exists(self.STATS_FILE):
-            try: 
-                with open(self.STATS_FILE, 'r') as f: return json.load(f)
-            except: 
-                pass
-        return {"wins": 0, "losses": 0, "history": []}
-
-    def _save_stats(self):
-        try: 
-            with open(self.STATS_FILE, 'w') as f: json.dump(self.stats, f, indent=4)
-        except: 
-            pass
-
-    def _record_trade(self, coin, pnl, outcome):
-        self.stats['history'].insert(0, {
-            "coin": coin, "pnl": round(pnl, 2),
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M"), "outcome": outcome
-        })
-        self.stats['history'] = self.stats['history'][:50]
-        if outcome == "WIN": self.stats['wins'] += 1
-        else: self.stats['losses'] += 1
-        self._save_stats()
-
-    def manage_positions(self, hands, positions, fleet_config, vision_module):
+        self.exiting = {}      # coin -> time the exit was sent (ignored until a newer book is seen)
+        self.book = []         # Positions (size/entry/margin) from the last user-state reconcile
+        self.book_synced = 0.0 # Time of the last successful reconcile (0 = no book yet)
+        self.entry_signals = {} # coin -> signal that opened the position (for the journal)
+        self.journal = TradeJournal(self.DATA_DIR, persist=persist)
+        self.stats = self.journal.stats # Same dict the dashboard reads from stats.json
+
+        # Ratchet checkpoint: restored on boot, matched to live positions by entry price
+        self.entries = {}  # coin -> entry of the position the high-water mark belongs to
+        self.dirty = False
+        self.last_checkpoint = 0.0
+        self.restored = self._load_ratchet()
+
+        # Risk loop (own thread); events are queued for the main loop to log
+        self.lock = threading.RLock()
+        self.events = queue.Queue()
+        self.closed = threading.Event() # Set on every accepted exit (positions changed)
+        self.running = False
+        self.thread = None
+        self.sync_wanted = threading.Event() # Reconcile now (after a fill), without dropping the current book
+
+    def note_entry(self, coin, signal):
+        """Remembers which signal opened `coin` so its exit is journaled under it."""
+        with self.lock:
+            self.entry_signals[coin] = signal
+            self.dirty = True
+
+    # --- RATCHET CHECKPOINT ---
+    def _load_ratchet(self):
+        if not self.persist or not os.path.exists(self.RATCHET_FILE): return {}
+        try:
+            with open(self.RATCHET_FILE, 'r') as f:
+                coins = json.load(f).get("coins", {})
+            if coins: print(f">> DEEP SEA: Ratchet checkpoint loaded ({', '.join(coins)})")
+            return coins
+        except Exception as e:
+            print(f"xx RATCHET LOAD FAILED: {e}")
+            return {}
+
+    def _checkpoint(self, now, force=False):
+        """Writes ratchet_state.json if anything changed (throttled, atomic replace)."""
+        if not self.persist or not self.dirty: return
+        if not force and now - self.last_checkpoint < self.CHECKPOINT_EVERY: return
+        coins = {
+            coin: {
+                # Everything _restore() needs; "secured" is re-derived from the high every tick
+                "high": round(high, 4), "entry": self.entries.get(coin),
+                "signal": self.entry_signals.get(coin)
+            }
+            for coin, high in self.highest_rois.items()
+        }
+        try:
+            temp = self.RATCHET_FILE + ".tmp"
+            with open(temp, 'w') as f: json.dump({"saved_at": round(now, 3), "coins": coins}, f)
+            os.replace(temp, self.RATCHET_FILE)
+            self.dirty = False
+            self.last_checkpoint = now
+        except Exception as e:
+            print(f"xx RATCHET SAVE FAILED: {e}")
+
+    def _restore(self, coin, entry, current_roi):
+        """High-water mark carried over from before a restart, if it is the same position."""
+        saved = self.restored.pop(coin, None)
+        if not saved or saved.get('entry') != entry: return current_roi
+        if saved.get('signal'): self.entry_signals.setdefault(coin, saved['signal'])
+        print(f">> DEEP SEA: Restored ratchet {coin} (High: {saved['high']:.2f}%)")
+        return max(current_roi, saved['high'])
+
+    def _record_trade(self, coin, pnl, outcome, roi=None, entry=None, size=None):
+        self.journal.record(coin, pnl, outcome, signal=self.entry_signals.pop(coin, None), roi=roi, entry=entry, size=size)
+
+    # --- RISK LOOP ---
+    def start(self, hands, vision, fleet_config, wallet, interval=0.5, reconcile_every=5.0, mark_age=3.0):
+        """
+        Runs the ratchet on its own thread, independent of the scanner.
+        Entry/size/margin come from the clearinghouse state: read every tick
+        while it streams for free, otherwise fetched over REST by a separate
+        sync thread every `reconcile_every` seconds (or on request_sync()), so a
+        slow fetch never pauses the stops. ROI is re-marked against Vision's
+        mid cache on every price update, at most `interval` seconds apart.
+        """
+        if self.running: return
+        self.running = True
+        args = (hands, vision, fleet_config, wallet, interval, reconcile_every, mark_age)
+        self.thread = threading.Thread(target=self._risk_loop, args=args, name="deep-sea", daemon=True)
+        self.thread.start()
+        self.sync_wanted.set() # First book right away
+        threading.Thread(target=self._sync_loop, args=(vision, wallet, reconcile_every), name="deep-sea-sync", daemon=True).start()
+        print(f">> DEEP SEA: Risk loop running ({interval}s, mark-driven)")
+
+    def stop(self):
+        self.running = False
+        self.sync_wanted.set()
+        with self.lock:
+            self._checkpoint(time.time(), force=True)
+
+    def request_sync(self):
+        """Reconcile against user state right away (e.g. after a fill). The last book stays in use meanwhile."""
+        self.sync_wanted.set()
+
+    def _set_book(self, vision, acct, as_of):
+        """as_of: when the state was read (a fetch's start), so exits sent meanwhile count as newer."""
+        self.book = vision.parse_positions(acct) # Swapped whole; the risk loop reads the reference
+        self.book_synced = as_of
+
+    def _sync_loop(self, vision, wallet, reconcile_every):
+        """REST reconcile, off the risk thread (idle while the user stream is live)."""
+        while self.running:
+            self.sync_wanted.wait(reconcile_every)
+            self.sync_wanted.clear()
+            if not self.running: return
+            if vision.user_stream_live(wallet): continue
+            try:
+                started = time.time()
+                with METRICS.span("deep_sea.sync"):
+                    acct = vision.get_user_state(wallet)
+                if acct: self._set_book(vision, acct, started)
+            except Exception as e:
+                METRICS.incr("deep_sea.errors")
+                print(f"xx DEEP SEA SYNC ERROR: {e}")
+
+    def _risk_loop(self, hands, vision, fleet_config, wallet, interval, reconcile_every, mark_age):
+        while self.running:
+            try:
+                if vision.user_stream_live(wallet):
+                    acct = vision.get_user_state(wallet) # Stream cache, no I/O
+                    if acct: self._set_book(vision, acct, vision.stream.user_state_at)
+                if self.book_synced: # Marks the last book even while a REST sync is slow or failing
+                    with METRICS.span("deep_sea.tick"):
+                        positions = self.mark_positions(self.book, vision.mids, mark_age)
+                        logs = self.manage_positions(hands, positions, fleet_config, vision, book_time=self.book_synced)
+                    for log in logs:
+                        self.events.put(log)
+            except Exception as e:
+                METRICS.incr("deep_sea.errors")
+                print(f"xx DEEP SEA LOOP ERROR: {e}")
+            vision.mids.wait(interval) # Next price update, or the interval
+
+    @staticmethod
+    def mark_positions(book, prices, max_age=None):
+        """
+        Re-marks positions at the latest mid: pnl = size * (mark - entry).
+        Keeps the snapshot pnl for any coin without a fresh price.
+        """
+        marked = []
+        for p in book:
+            mark = prices.get(p['coin'], max_age) if prices else None
+            if mark: p = dict(p, pnl=float(p['size']) * (mark - float(p['entry'])), mark=mark)
+            marked.append(p)
+        return marked
+
+    def drain_events(self):
+        """Risk events since the last call (non-blocking)."""
+        out = []
+        while True:
+            try: out.append(self.events.get_nowait())
+            except queue.Empty: return out
+
+    def manage_positions(self, hands, positions, fleet_config, vision_module, book_time=None):
+        """
+        book_time: when `positions` was read from the exchange. None = current
+        (the caller's positions already reflect every exit, e.g. backtests).
+        """
+        with self.lock:
+            return self._manage_positions(hands, positions, fleet_config, vision_module, book_time)
+
+    def _manage_positions(self, hands, positions, fleet_config, vision_module, book_time=None):
         events = []
-        self.secured_coins = [] 
+        exits = [] # (coin, side, size, pnl, outcome, entry, roi) - sent together after the scan
+        secured = []
 
         current_coins = [p['coin'] for p in positions]
         
         # Clean up old trackers
         for c in list(self.highest_rois.keys()):
-            if c not in current_coins: del self.highest_rois[c]
+            if c not in current_coins:
+                del self.highest_rois[c]
+                self.entries.pop(c, None)
+                self.dirty = True
+        now = time.time()
+        # An exit is settled once a book read after it arrives: gone = closed,
+        # still there = partial fill / new position, evaluated afresh
+        fresh = book_time is None
+        for c in list(self.exiting.keys()):
+            if fresh or book_time > self.exiting[c]: del self.exiting[c]
 
         for p in positions:
             coin = p['coin']
+            # Close already sent, this book predates it
+            if coin in self.exiting: continue
             size = float(p['size'])
             entry = float(p['entry'])
             pnl = float(p['pnl'])
@@ -66,30 +228,29 @@ class DeepSea:
             current_roi = (pnl / margin) * 100
 
             # 1. Update High Water Mark (ROI based)
-            if coin not in self.highest_rois: self.highest_rois[coin] = current_roi
-            if current_roi > self.highest_rois[coin]: self.highest_rois[coin] = current_roi
+            if coin not in self.highest_rois:
+                self.highest_rois[coin] = self._restore(coin, entry, current_roi)
+            if self.entries.get(coin) != entry:
+                self.entries[coin] = entry
+                self.dirty = True
+            if current_roi > self.highest_rois[coin]:
+                self.highest_rois[coin] = current_roi
+                self.dirty = True
             
             high_water_roi = self.highest_rois[coin]
 
             # 2. Determine Hard Stop based on Type
             c_type = fleet_config.get(coin, {}).get('type', 'MEME')
-            
-            if c_type == 'PRINCE':
-                hard_stop_roi = -6.0
-            else:
-                hard_stop_roi = -8.0
+            hard_stop_roi = self.HARD_STOPS.get(c_type, self.HARD_STOPS['MEME'])
 
             # 3. Calculate Dynamic Trail Gap
             # Default Trail: 3%
-            trail_gap = 3.0
-            
             # Step 1: Above 5% ROI -> Tighten to 1.5%
-            if high_water_roi >= 5.0:
-                trail_gap = 1.5
-            
             # Step 2: Above 12% ROI -> Tighten to 0.5%
-            if high_water_roi >= 12.0:
-                trail_gap = 0.5
+            trail_gap = self.TRAIL_GAP
+            for step_roi, step_gap in self.TRAIL_STEPS:
+                if high_water_roi >= step_roi:
+                    trail_gap = step_gap
 
             # 4. Calculate Trigger ROI
             # The trigger is the High Water Mark minus the Gap
@@ -98,9 +259,9 @@ class DeepSea:
             # 5. Breakeven Override
             # If we hit 0.40% ROI, the stop must at least be Break Even (0%)
             # We ensure the trigger never drops below 0 if we passed 0.4%
-            if high_water_roi >= 0.40:
+            if high_water_roi >= self.BREAKEVEN_ROI:
                 trigger_roi = max(0.0, trigger_roi)
-                self.secured_coins.append(coin)
+                secured.append(coin)
 
             # --- EXECUTION CHECK ---
             
@@ -108,19 +269,39 @@ class DeepSea:
             if current_roi <= hard_stop_roi:
                 if hands:
                     print(f">> 💀 HARD STOP: {coin} @ {current_roi:.2f}%")
-                    hands.place_market_order(coin, "SELL" if size > 0 else "BUY", abs(size), reduce_only=True)
-                    self._record_trade(coin, pnl, "LOSS")
-                    events.append(f"💀 HARD STOP: {coin} cut at {current_roi:.2f}%")
+                    exits.append((coin, "SELL" if size > 0 else "BUY", abs(size), pnl, "LOSS", entry, current_roi))
                 continue # Skip trailing check if hard stop hit
 
             # B. Check Trailing Stop
             # Only trigger if current ROI fell below the calculated trigger AND we are in profit zone (or passed BE)
             # The logic: If High Water is 10%, Gap is 1.5%, Trigger is 8.5%. If Current is 8.4%, SELL.
-            if current_roi <= trigger_roi and high_water_roi >= 0.40:
+            if current_roi <= trigger_roi and high_water_roi >= self.BREAKEVEN_ROI:
                  if hands:
                     print(f">> 📉 TRAIL HIT: {coin} @ {current_roi:.2f}% (High: {high_water_roi:.2f}% | Gap: {trail_gap}%)")
-                    hands.place_market_order(coin, "SELL" if size > 0 else "BUY", abs(size), reduce_only=True)
-                    self._record_trade(coin, pnl, "WIN")
-                    events.append(f"💰 TRAIL SECURED: {coin} at {current_roi:.2f}% ROI")
+                    exits.append((coin, "SELL" if size > 0 else "BUY", abs(size), pnl, "WIN", entry, current_roi))
+
+        # All exits this tick go out as one reduce-only bulk order (one round trip in a dump).
+        # Only legs the exchange took are booked; a rejected leg keeps its ratchet and retries next tick.
+        if exits:
+            legs = hands.close_positions([(coin, side, size, None) for coin, side, size, *_ in exits]) or {}
+            for coin, side, size, pnl, outcome, entry, roi in exits:
+                leg = legs.get(coin, {"status": "failed"})
+                if not leg.get('accepted'):
+                    METRICS.incr("deep_sea.exit_failed")
+                    events.append(f"⚠️ EXIT FAILED: {coin} ({leg.get('error', leg['status'])}), retrying")
+                    continue
+                self._record_trade(coin, pnl, outcome, roi=roi, entry=entry, size=size if side == "SELL" else -size)
+                self.highest_rois.pop(coin, None) # Next position starts a fresh ratchet
+                self.entries.pop(coin, None)
+                self.exiting[coin] = now
+                self.request_sync() # Settle the exit against a book read after it
+                self.closed.set()
+                self.dirty = True
+                if outcome == "LOSS": events.append(f"💀 HARD STOP: {coin} cut at {roi:.2f}%")
+                else: events.append(f"💰 TRAIL SECURED: {coin} at {roi:.2f}% ROI")
 
+        if secured != self.secured_coins: self.dirty = True
+        self.secured_coins = secured # Swapped whole so readers never see a half-built list
+        self.restored.clear() # Checkpointed coins with no matching live position are stale
+        self._checkpoint(now)
         return events
@@ -0,0 +1,51 @@
+import indicators
+
+# ==============================================================================
+#  LUMA FLEET
+#  The traded coins and the per-coin scoring shared by the live loop (main.py)
+#  and the backtester. Kept free of exchange/stream imports so offline tools
+#  can use it without the Hyperliquid SDK.
+# ==============================================================================
+
+STARTING_EQUITY = 412.0
+
+# [BLUEPRINT] High-Volatility Fleet
+FLEET_CONFIG = {
+    "SOL":   {"type": "PRINCE", "lev": 5},
+    "SUI":   {"type": "PRINCE", "lev": 5},
+    "BNB":   {"type": "PRINCE", "lev": 5},
+    "WIF":   {"type": "MEME",   "lev": 5},
+    "DOGE":  {"type": "MEME",   "lev": 5},
+    "PENGU": {"type": "MEME",   "lev": 5}
+}
+
+def scan_coin(coin, candles, smart_money, xenomorph, bank=None, coin_type=None):
+    """
+    Scores a single coin from its 15m candles.
+    coin_type: PRINCE/MEME; defaults to the live fleet's entry (MEME if unknown).
+    """
+    if not candles: return None
+
+    curr_price = float(candles[-1]['c'])
+    c_type = coin_type or FLEET_CONFIG.get(coin, {}).get('type', 'MEME')
+
+    # Indicators are computed once and shared by every organ.
+    # Streaming state is O(1) per tick; the window recompute covers its warm-up.
+    ind = bank.update(coin, "15m", candles) if bank else None
+    if not ind or ind['bars'] < len(candles):
+        ind = indicators.snapshot(candles)
+
+    # 1. Smart Money Signal
+    sm_sig = smart_money.hunt_turtle(candles, coin_type=c_type, ind=ind)
+    quality = "NEUTRAL"
+    if sm_sig: quality = sm_sig['type'] 
+
+    # 2. Xenomorph Override
+    xeno_sig = xenomorph.hunt(coin, candles, ind=ind)
+    if xeno_sig == "ATTACK": quality = "⚔️ BREAKOUT"
+
+    return {
+        "coin": coin, "price": curr_price,
+        "vol_m": round(float(candles[-1]['v'])/1000000, 2),
+        "quality": quality
+    }
@@ -1,14 +1,77 @@
 import json
 import time
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from eth_account import Account
 from hyperliquid.info import Info
 from hyperliquid.exchange import Exchange
 from hyperliquid.utils import constants
+from telemetry import METRICS
+
+ACCEPTED = ("filled", "resting", "acked") # Leg statuses the exchange took
+
+def leg_outcome(st):
+    """One order status from an exchange response -> {status, filled_sz, avg_px, error}."""
+    if not isinstance(st, dict): return {"status": "acked"}
+    if 'filled' in st:
+        f = st['filled']
+        return {"status": "filled", "filled_sz": float(f.get('totalSz', 0)), "avg_px": float(f.get('avgPx', 0))}
+    if 'resting' in st:
+        return {"status": "resting"}
+    if 'error' in st:
+        return {"status": "rejected", "error": str(st['error'])[:120]}
+    return {"status": "acked"}
+
+class ActionGate:
+    """
+    Lets one signed exchange action through at a time. Urgent callers
+    (DeepSea exits) go ahead of every queued non-urgent one (entries), so a
+    stop waits for at most the single request already on the wire.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.busy = False
+        self.urgent_waiting = 0
+
+    @contextmanager
+    def hold(self, urgent=False):
+        with self.cond:
+            if urgent: self.urgent_waiting += 1
+            try:
+                while self.busy or (not urgent and self.urgent_waiting):
+                    self.cond.wait()
+            finally:
+                if urgent: self.urgent_waiting -= 1
+            self.busy = True
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
 
 class Hands:
-    def __init__(self, config=None):
+    SLIPPAGE = 0.05 # Aggressive IOC limit, same as the SDK's market orders
+
+    def __init__(self, config=None, price_source=None, max_price_age=2.0, atlas=None):
         print(">> HANDS ARMED: Initializing Hyperliquid Bridge...")
+
+        # Asset metadata index (precision per coin); hardcoded table is the fallback
+        self.atlas = atlas
+
+        # Shared mid-price cache (anything with get(coin, max_age) / update(mids)).
+        # Orders only hit allMids when the cached price is older than max_price_age.
+        self.price_source = price_source
+        self.max_price_age = max_price_age
+
+        # The SDK signs every action with the current ms timestamp as its nonce, so
+        # actions from different threads (pipeline workers, DeepSea exits) go out one
+        # at a time, each in a later millisecond than the last. Exits jump the queue.
+        self.gate = ActionGate()
+        self.last_action_ms = 0
         
         # Load Keys (Railway Env Vars)
         self.private_key = os.getenv("PRIVATE_KEY")
@@ -40,7 +103,10 @@ class Hands:
             self.wallet_address = None
 
     def _get_precision(self, coin):
-        # HARDCODED FLEET PRECISION
+        # Exchange metadata first (any coin), then the HARDCODED FLEET PRECISION
+        if self.atlas:
+            prec = self.atlas.precision(coin)
+            if prec: return prec
         if coin == "SOL":   return (2, 2)
         if coin == "SUI":   return (4, 1)
         if coin == "BNB":   return (1, 3)
@@ -49,14 +115,26 @@ class Hands:
         if coin == "PENGU": return (5, 0)
         return (4, 1)
 
-    def cancel_all_orders(self, coin):
+    def _signed(self, action, *args, urgent=False, **kwargs):
+        """Runs one signed Exchange action (serialized, unique nonce; urgent = exit priority)."""
+        with self.gate.hold(urgent):
+            wait = (self.last_action_ms + 1) / 1000 - time.time()
+            if wait > 0: time.sleep(wait)
+            try:
+                return action(*args, **kwargs)
+            finally:
+                self.last_action_ms = int(time.time() * 1000)
+
+    def cancel_all_orders(self, coin=None):
+        """Cancels resting orders on `coin` (every coin if None) in one bulk request."""
         if not self.exchange: return
         try:
             open_orders = self.info.open_orders(self.wallet_address)
-            for order in open_orders:
-                if order['coin'] == coin:
-                    self.exchange.cancel(coin, order['oid'])
-                    print(f">> 🧹 SWEEP: Cancelled active order on {coin}")
+            cancels = [{"coin": o['coin'], "oid": o['oid']} for o in open_orders if coin is None or o['coin'] == coin]
+            if not cancels: return
+            res = self._signed(self.exchange.bulk_cancel, cancels)
+            print(f">> 🧹 SWEEP: Cancelled {len(cancels)} active order(s) on {coin or 'ALL'}")
+            return res
         except Exception as e:
             print(f"xx CLEANUP ERROR: {e}")
 
@@ -64,54 +142,248 @@ class Hands:
         if not self.exchange: return
         self.cancel_all_orders(coin)
 
-        px_prec, sz_prec = self._get_precision(coin)
-        final_price = round(price, px_prec)
+        px_prec, _ = self._get_precision(coin)
+        final_price = (self.atlas.round_price(coin, price) if self.atlas else None) or round(price, px_prec)
         
         if final_price == 0: return
 
-        raw_size = size_usd / final_price
-        if sz_prec == 0: final_size = int(raw_size)
-        else: final_size = round(raw_size, sz_prec)
+        final_size = self._round_size(coin, size_usd / final_price)
 
         if final_size == 0: return
 
         print(f">> 🕸️ TRAP: {side} {coin} @ {final_price} (Size: {final_size})")
         try:
             is_buy = True if side == "BUY" else False
-            res = self.exchange.order(coin, is_buy, final_size, final_price, {"limit": {"tif": "Gtc"}})
+            res = self._signed(self.exchange.order, coin, is_buy, final_size, final_price, {"limit": {"tif": "Gtc"}})
             if res['status'] == 'err':
                 print(f"xx REJECTED: {res['response']}")
+            return res
         except Exception as e:
             print(f"xx ORDER EXCEPTION: {e}")
 
-    def place_market_order(self, coin, side, size_usd):
-        # NOTE: size_usd is passed here. We convert to coins.
+    def _resolve_price(self, coin, price=None):
+        """Caller's price -> fresh cached mid -> allMids (last resort, refreshes the cache)."""
+        if price: return float(price)
+        if self.price_source:
+            px = self.price_source.get(coin, self.max_price_age)
+            if px: return px
+        prices = self.info.all_mids()
+        if self.price_source: self.price_source.update(prices)
+        return float(prices.get(coin, 0))
+
+    def _round_size(self, coin, size_coins):
+        """Exchange size decimals via Atlas; the hardcoded fleet table if the coin is unknown."""
+        if self.atlas:
+            sz = self.atlas.round_size(coin, size_coins)
+            if sz is not None: return sz
+        _, sz_prec = self._get_precision(coin)
+        if sz_prec == 0: return int(size_coins)
+        return round(float(size_coins), sz_prec)
+
+    def _ioc_request(self, coin, is_buy, sz, px, reduce_only=False):
+        """SDK order request for an aggressive IOC limit (market) order."""
+        limit_px = self.exchange._slippage_price(coin, is_buy, self.SLIPPAGE, px)
+        return {
+            "coin": coin, "is_buy": is_buy, "sz": sz, "limit_px": limit_px,
+            "order_type": {"limit": {"tif": "Ioc"}}, "reduce_only": reduce_only
+        }
+
+    def place_market_order(self, coin, side, size, price=None, reduce_only=False):
+        """
+        Market order (aggressive IOC limit).
+        size: USD notional for entries; COINS when reduce_only=True (DeepSea exits).
+        price: optional reference price the caller already has (skips the lookup).
+        """
         if not self.exchange: return
         try:
-            # 1. Get Price for Conversion
-            # We assume current price is close to last trade, or we fetch fresh?
-            # For speed, we just trust the call, but ideally we fetch price here.
-            # Simplified: We treat size_usd as "number of coins" if the caller failed to convert,
-            # BUT main.py passes 60.0 USD. We need the price.
-            
-            # SAFEGUARD: To avoid crash, we need to fetch price to convert USD -> Coins
-            # Since Hands shouldn't depend on Vision, we use the Exchange info if possible,
-            # or we rely on the caller to pass 'size_coins'. 
-            
-            # HOTFIX for Main.py passing USD:
-            # We will use the 'allMids' from info to convert quickly.
-            prices = self.info.all_mids()
-            price = float(prices.get(coin, 0))
-            if price == 0: return
-
-            size_coins = size_usd / price
+            px = self._resolve_price(coin, price)
+            if px == 0: return
 
-            _, sz_prec = self._get_precision(coin)
-            if sz_prec == 0: sz = int(size_coins)
-            else: sz = round(float(size_coins), sz_prec)
+            sz = self._round_size(coin, abs(size) if reduce_only else size / px)
+            if sz == 0: return
 
             is_buy = True if side == "BUY" else False
-            print(f"⚡ MARKET {side}: {coin} x {sz}")
-            self.exchange.market_open(coin, is_buy, sz)
+            print(f"⚡ MARKET {side}: {coin} x {sz}{' (REDUCE)' if reduce_only else ''}")
+            with METRICS.span("hands.market_order"):
+                if reduce_only:
+                    limit_px = self.exchange._slippage_price(coin, is_buy, self.SLIPPAGE, px)
+                    res = self._signed(self.exchange.order, coin, is_buy, sz, limit_px, {"limit": {"tif": "Ioc"}},
+                                       reduce_only=True, urgent=True)
+                else:
+                    res = self._signed(self.exchange.market_open, coin, is_buy, sz, px=px, slippage=self.SLIPPAGE)
+            if res and res.get('status') == 'err':
+                METRICS.incr("hands.rejected")
+                print(f"xx REJECTED: {res.get('response')}")
+            return res
         except Exception as e:
+            METRICS.incr("hands.errors")
             print(f"xx MARKET FAIL: {e}")
+
+    # --- BULK (one signed request for many orders) ---
+    def _send_bulk(self, requests, label):
+        """Sends the requests as one bulk order. Returns one leg_outcome() per request, in order."""
+        if not requests: return []
+        try:
+            with METRICS.span(f"hands.bulk_{label.lower()}"):
+                res = self._signed(self.exchange.bulk_orders, requests, urgent=(label == "EXIT"))
+        except Exception as e:
+            METRICS.incr("hands.errors")
+            print(f"xx BULK {label} FAIL: {e}")
+            return [{"status": "failed", "error": str(e)[:120]} for _ in requests]
+        if not res:
+            return [{"status": "failed", "error": "no response"} for _ in requests]
+        if res.get('status') != 'ok':
+            METRICS.incr("hands.rejected", len(requests))
+            print(f"xx BULK {label} REJECTED: {res.get('response')}")
+            return [{"status": "rejected", "error": str(res.get('response'))[:120]} for _ in requests]
+
+        response = res.get('response')
+        statuses = (response.get('data') or {}).get('statuses', []) if isinstance(response, dict) else []
+        legs = []
+        for i, req in enumerate(requests):
+            leg = leg_outcome(statuses[i]) if i < len(statuses) else {"status": "acked"}
+            if leg['status'] == "rejected":
+                METRICS.incr("hands.rejected")
+                print(f"xx {label} REJECTED {req['coin']}: {leg['error']}")
+            legs.append(leg)
+        return legs
+
+    def close_positions(self, exits):
+        """
+        Reduce-only market exits in a single request.
+        exits: [(coin, side, size_coins, price or None)]
+        Returns {coin: leg_outcome + accepted}; legs that never went out are "failed".
+        """
+        out = {coin: {"status": "failed", "error": "not sent", "accepted": False} for coin, *_ in exits}
+        if not self.exchange: return out
+        requests = []
+        for coin, side, size, price in exits:
+            try:
+                px = self._resolve_price(coin, price)
+                sz = self._round_size(coin, abs(size))
+                if px == 0 or sz == 0: continue
+                requests.append(self._ioc_request(coin, side == "BUY", sz, px, reduce_only=True))
+            except Exception as e:
+                print(f"xx EXIT PREP FAIL {coin}: {e}")
+        if requests:
+            legs = ", ".join(f"{r['coin']} x {r['sz']}" for r in requests)
+            print(f"⚡ BULK EXIT: {legs}")
+        for req, leg in zip(requests, self._send_bulk(requests, "EXIT")):
+            out[req['coin']] = dict(leg, sz=req['sz'], accepted=leg['status'] in ACCEPTED)
+        return out
+
+    def open_positions(self, entries):
+        """
+        Market entries in a single request.
+        entries: [(coin, side, size_usd, price or None)]
+        Returns [(request, leg_outcome)] for the legs that went out.
+        """
+        if not self.exchange: return []
+        requests = []
+        for coin, side, size_usd, price in entries:
+            try:
+                px = self._resolve_price(coin, price)
+                if px == 0: continue
+                sz = self._round_size(coin, size_usd / px)
+                if sz == 0: continue
+                requests.append(self._ioc_request(coin, side == "BUY", sz, px))
+            except Exception as e:
+                print(f"xx ENTRY PREP FAIL {coin}: {e}")
+        if requests:
+            legs = ", ".join(f"{r['coin']} x {r['sz']}" for r in requests)
+            print(f"⚡ BULK ENTRY: {legs}")
+        return list(zip(requests, self._send_bulk(requests, "ENTRY")))
+
+class OrderPipeline:
+    """
+    Non-blocking order submission on top of Hands.
+    Orders are queued to worker threads so a slow exchange never stalls the
+    scanner; the signed requests themselves go out one at a time, behind any
+    exit (see Hands._signed). A coin with an order in flight (or filled but
+    not yet visible in the clearinghouse positions) is locked against
+    duplicate entries.
+    Acks/fills are reported back through drain().
+    """
+    def __init__(self, hands, workers=4, settle_s=20.0):
+        self.hands = hands
+        self.settle_s = settle_s
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="orders")
+        self.lock = threading.Lock()
+        self.inflight = {}  # coin -> order
+        self.settling = {}  # coin -> lock expiry (filled, waiting for positions to show it)
+        self.reports = queue.Queue()
+        self.filled = threading.Event() # Set on every fill (positions changed)
+        self.latency = METRICS.histogram("orders.submit_to_ack_ms")
+
+    def is_busy(self, coin):
+        with self.lock:
+            if coin in self.inflight: return True
+            return self.settling.get(coin, 0) > time.time()
+
+    def busy_coins(self):
+        now = time.time()
+        with self.lock:
+            return set(self.inflight) | {c for c, until in self.settling.items() if until > now}
+
+    def submit(self, coin, side, size_usd, price=None, kind="market", tag=None):
+        """Queues an entry. Returns False if the coin already has one in flight."""
+        if not self.hands or not self.hands.exchange: return False
+        order = {
+            "coin": coin, "side": side, "size_usd": size_usd, "price": price,
+            "kind": kind, "tag": tag, "submitted": time.monotonic()
+        }
+        with self.lock:
+            if coin in self.inflight or self.settling.get(coin, 0) > time.time(): return False
+            self.inflight[coin] = order
+        self.pool.submit(self._send, order)
+        return True
+
+    def _send(self, order):
+        coin = order['coin']
+        res = None
+        try:
+            if order['kind'] == "trap":
+                res = self.hands.place_trap(coin, order['side'], order['price'], order['size_usd'])
+            else:
+                res = self.hands.place_market_order(coin, order['side'], order['size_usd'], price=order['price'])
+        except Exception as e:
+            print(f"xx PIPELINE ERROR {coin}: {e}")
+
+        ack_ms = (time.monotonic() - order['submitted']) * 1000
+        self.latency.observe(ack_ms)
+        report = dict(order, ack_ms=round(ack_ms, 1), **self._parse(res))
+        del report['submitted']
+
+        with self.lock:
+            self.inflight.pop(coin, None)
+            if report['status'] in ("filled", "resting"):
+                self.settling[coin] = time.time() + self.settle_s
+        self.reports.put(report)
+        if report['status'] == "filled": self.filled.set()
+
+    def _parse(self, res):
+        """Exchange response -> {status, filled_sz, avg_px, error}."""
+        if not res: return {"status": "failed", "error": "no response"}
+        if res.get('status') != 'ok': return {"status": "rejected", "error": str(res.get('response'))[:120]}
+        try:
+            statuses = res['response']['data']['statuses']
+        except (KeyError, TypeError):
+            return {"status": "acked"}
+        for st in statuses:
+            leg = leg_outcome(st)
+            if leg['status'] != "acked": return leg
+        return {"status": "acked"}
+
+    def reconcile(self, position_coins):
+        """Releases settle locks once fills show up in the clearinghouse positions."""
+        with self.lock:
+            for coin in list(self.settling):
+                if coin in position_coins or self.settling[coin] <= time.time():
+                    del self.settling[coin]
+
+    def drain(self):
+        """All reports since the last call (non-blocking)."""
+        out = []
+        while True:
+            try: out.append(self.reports.get_nowait())
+            except queue.Empty: return out
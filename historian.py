@@ -1,3 +1,5 @@
+import indicators
+
 class Historian:
     def __init__(self):
         print(">> Historian (Cycle Logic) Loaded")
@@ -11,9 +13,9 @@ class Historian:
         
         try:
             # Calculate 200 SMA
-            closes = [float(c['c']) for c in btc_candles[-200:]]
-            sma_200 = sum(closes) / len(closes)
-            current_price = closes[-1]
+            closes = indicators.columns(btc_candles[-200:])['c']
+            sma_200 = float(indicators.sma(closes, 200)[0])
+            current_price = float(closes[-1])
             
             # DETERMINATE CYCLE PHASE
             if current_price > sma_200:
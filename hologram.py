@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+from telemetry import METRICS
+
+class StatePublisher:
+    """
+    Publishes the dashboard snapshot without blocking the trading loop.
+    publish() only swaps the latest state in memory; a background writer
+    coalesces bursts, rate-limits to one write per `min_interval` seconds,
+    skips unchanged snapshots, and replaces the file atomically. Every write
+    carries an increasing `seq` so readers can tell new snapshots from old.
+    """
+    def __init__(self, path, min_interval=1.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock() # Writer thread vs flush(): one writer of the file (and .tmp)
+        self.pending = threading.Event()
+        self.state = None
+        self.seq = self._last_seq() # Continues across restarts so readers always see it increase
+        self.last_body = None
+        self.last_write = 0.0
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, name="hologram", daemon=True)
+        self.thread.start()
+
+    def publish(self, state):
+        """Non-blocking: the newest state wins, older unwritten ones are dropped."""
+        with self.lock:
+            self.state = state
+        self.pending.set()
+
+    def _last_seq(self):
+        try:
+            with open(self.path, 'r') as f: return int(json.load(f).get("seq", 0))
+        except Exception:
+            return 0
+
+    def latest(self):
+        with self.lock:
+            return self.state
+
+    def _writer(self):
+        while self.running:
+            self.pending.wait()
+            wait = self.min_interval - (time.time() - self.last_write)
+            if wait > 0: time.sleep(wait) # Coalesce everything published meanwhile
+            self.pending.clear()
+            self._write()
+
+    def _write(self):
+        with self.write_lock:
+            self._write_locked()
+
+    def _write_locked(self):
+        with self.lock:
+            state = self.state
+        if state is None: return
+        try:
+            body = json.dumps(state)
+            if body == self.last_body: return # Nothing changed since the last snapshot
+            self.seq += 1
+            with METRICS.span("hologram.write"):
+                temp = self.path + ".tmp"
+                with open(temp, 'w') as f:
+                    json.dump({"seq": self.seq, "published_at": round(time.time(), 3), **state}, f)
+                os.replace(temp, self.path)
+            self.last_body = body
+        except PermissionError:
+            self.pending.set() # Reader holds the file (Windows/volume quirk): retry next window
+        except Exception as e:
+            print(f"xx HOLOGRAM WRITE ERROR: {e}")
+        finally:
+            self.last_write = time.time()
+
+    def flush(self):
+        """Writes the latest state now (shutdown)."""
+        self.running = False
+        self.pending.set() # Let the writer thread leave its wait
+        self._write()
@@ -0,0 +1,358 @@
+import json
+import os
+import time
+import threading
+import numpy as np
+from collections import deque
+from functools import lru_cache
+from candles import Candles
+
+# ==============================================================================
+#  LUMA INDICATOR ENGINE
+#  One definition of every indicator, shared by all signal organs.
+#  Every function takes a 2-D array (coins x candles, oldest first) and
+#  returns the latest value per coin. 1-D input is treated as a single coin.
+# ==============================================================================
+
+def _rows(values):
+    arr = np.asarray(values, dtype=np.float64)
+    return arr.reshape(1, -1) if arr.ndim == 1 else arr
+
+def rsi(closes, period=14):
+    """
+    RSI over the last `period` price changes (simple average of gains/losses).
+    50 when there is not enough data, 100 when there were no losses.
+    """
+    c = _rows(closes)
+    if c.shape[1] < period + 1:
+        return np.full(c.shape[0], 50.0)
+    deltas = np.diff(c[:, -(period + 1):], axis=1)
+    avg_gain = np.clip(deltas, 0, None).mean(axis=1)
+    avg_loss = np.clip(-deltas, 0, None).mean(axis=1)
+    rs = np.divide(avg_gain, avg_loss, out=np.zeros_like(avg_gain), where=avg_loss > 0)
+    return np.where(avg_loss > 0, 100 - (100 / (1 + rs)), 100.0)
+
+@lru_cache(maxsize=64)
+def _ema_weights(length, period):
+    k = 2 / (period + 1)
+    weights = k * (1 - k) ** np.arange(length - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - k) ** (length - 1) # Seed: first price
+    weights.flags.writeable = False
+    return weights
+
+def ema(closes, period):
+    """EMA seeded with the first price of the window (closed form, one dot product)."""
+    c = _rows(closes)
+    if c.shape[1] == 0:
+        return np.zeros(c.shape[0])
+    return c @ _ema_weights(c.shape[1], period)
+
+def sma(values, period):
+    """Mean of the last `period` values."""
+    v = _rows(values)
+    if v.shape[1] == 0:
+        return np.zeros(v.shape[0])
+    return v[:, -period:].mean(axis=1)
+
+def atr(highs, lows, closes, period=14):
+    """Average True Range (simple mean of the last `period` true ranges)."""
+    h, l, c = _rows(highs), _rows(lows), _rows(closes)
+    if c.shape[1] < 2:
+        return (h - l)[:, -1] if c.shape[1] else np.zeros(c.shape[0])
+    prev_c = c[:, :-1]
+    tr = np.maximum.reduce([
+        h[:, 1:] - l[:, 1:],
+        np.abs(h[:, 1:] - prev_c),
+        np.abs(l[:, 1:] - prev_c)
+    ])
+    return tr[:, -period:].mean(axis=1)
+
+def volume_avg(volumes, period=10, include_current=False):
+    """Average volume of the last `period` bars (optionally excluding the live bar)."""
+    v = _rows(volumes)
+    window = v[:, -period:] if include_current else v[:, -(period + 1):-1]
+    if window.shape[1] == 0:
+        return np.zeros(v.shape[0])
+    return window.mean(axis=1)
+
+# ==========================================
+# SNAPSHOTS (what the organs consume)
+# ==========================================
+def columns(candles):
+    """o/h/l/c/v float arrays (zero-copy for columnar Candles, built for candle lists)."""
+    if isinstance(candles, Candles):
+        return {k: getattr(candles, k) for k in ('o', 'h', 'l', 'c', 'v')}
+    return {
+        k: np.fromiter((c[k] for c in candles), dtype=np.float64, count=len(candles))
+        for k in ('o', 'h', 'l', 'c', 'v')
+    }
+
+def _compute(cols):
+    c, v = cols['c'], cols['v']
+    return {
+        "price": c[:, -1],
+        "rsi": rsi(c, 14),
+        "ema_20": ema(c, 20),
+        "ema_50": ema(c, 50),
+        "atr": atr(cols['h'], cols['l'], c, 14),
+        "vol_avg": volume_avg(v, 10),
+        "vol_avg_incl": volume_avg(v, 10, include_current=True),
+    }
+
+def snapshot(candles):
+    """Latest indicator values for one coin, as plain floats."""
+    if not candles: return None
+    cols = {k: arr.reshape(1, -1) for k, arr in columns(candles).items()}
+    return {k: float(val[0]) for k, val in _compute(cols).items()}
+
+# ==========================================
+# STREAMING (O(1) per bar, checkpointable)
+# ==========================================
+# Each indicator keeps state for CLOSED bars only. `push()` commits a closed
+# bar; `peek()` evaluates the still-forming bar on top of that state without
+# changing it, so revising the live bar every tick is cheap.
+
+class StreamingEMA:
+    def __init__(self, period, value=None):
+        self.period = period
+        self.k = 2 / (period + 1)
+        self.value = value
+
+    def push(self, price):
+        self.value = self.peek(price)
+
+    def peek(self, price):
+        if self.value is None: return price
+        return (price * self.k) + (self.value * (1 - self.k))
+
+    def state(self):
+        return {"value": self.value}
+
+    def restore(self, st):
+        self.value = st.get("value")
+
+class StreamingMean:
+    """Rolling mean of the last `period` closed values."""
+    def __init__(self, period):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.pushes = 0
+
+    def push(self, x):
+        if len(self.values) == self.period:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+        self.pushes += 1
+        # Re-sum now and then so float drift never accumulates
+        if self.pushes % (self.period * 100) == 0:
+            self.total = sum(self.values)
+
+    def mean(self):
+        """Mean of the closed window (live bar excluded)."""
+        return self.total / len(self.values) if self.values else 0.0
+
+    def peek(self, x):
+        """Mean of the window with the live value as its newest member."""
+        if len(self.values) < self.period:
+            return (self.total + x) / (len(self.values) + 1)
+        return (self.total - self.values[0] + x) / self.period
+
+    def state(self):
+        return {"values": list(self.values)}
+
+    def restore(self, st):
+        self.values = deque(st.get("values", []), maxlen=self.period)
+        self.total = sum(self.values)
+
+class StreamingRSI:
+    """
+    Incremental RSI. By default it matches rsi() above (simple average of the
+    last `period` changes); wilder=True uses Wilder's smoothing instead.
+    """
+    def __init__(self, period=14, wilder=False):
+        self.period = period
+        self.wilder = wilder
+        self.last_close = None
+        self.gains = StreamingMean(period)
+        self.losses = StreamingMean(period)
+        self.avg_gain = None # Wilder state
+        self.avg_loss = None
+
+    def push(self, close):
+        if self.last_close is not None:
+            delta = close - self.last_close
+            g, l = max(delta, 0.0), max(-delta, 0.0)
+            if self.wilder and self.avg_gain is not None:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + g) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + l) / self.period
+            self.gains.push(g)
+            self.losses.push(l)
+            if self.wilder and self.avg_gain is None and len(self.gains.values) == self.period:
+                self.avg_gain, self.avg_loss = self.gains.mean(), self.losses.mean()
+        self.last_close = close
+
+    def peek(self, close):
+        if self.last_close is None: return 50.0
+        delta = close - self.last_close
+        g, l = max(delta, 0.0), max(-delta, 0.0)
+        if self.wilder and self.avg_gain is not None:
+            avg_gain = (self.avg_gain * (self.period - 1) + g) / self.period
+            avg_loss = (self.avg_loss * (self.period - 1) + l) / self.period
+        else:
+            if len(self.gains.values) + 1 < self.period: return 50.0
+            avg_gain, avg_loss = self.gains.peek(g), self.losses.peek(l)
+        if avg_loss <= 0: return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def state(self):
+        return {
+            "last_close": self.last_close, "gains": self.gains.state(), "losses": self.losses.state(),
+            "avg_gain": self.avg_gain, "avg_loss": self.avg_loss
+        }
+
+    def restore(self, st):
+        self.last_close = st.get("last_close")
+        self.gains.restore(st.get("gains", {}))
+        self.losses.restore(st.get("losses", {}))
+        self.avg_gain, self.avg_loss = st.get("avg_gain"), st.get("avg_loss")
+
+class StreamingATR:
+    def __init__(self, period=14):
+        self.last_close = None
+        self.ranges = StreamingMean(period)
+
+    def _true_range(self, h, l):
+        if self.last_close is None: return h - l
+        return max(h - l, abs(h - self.last_close), abs(l - self.last_close))
+
+    def push(self, h, l, c):
+        if self.last_close is not None:
+            self.ranges.push(self._true_range(h, l))
+        self.last_close = c
+
+    def peek(self, h, l):
+        if self.last_close is None: return h - l
+        return self.ranges.peek(self._true_range(h, l))
+
+    def state(self):
+        return {"last_close": self.last_close, "ranges": self.ranges.state()}
+
+    def restore(self, st):
+        self.last_close = st.get("last_close")
+        self.ranges.restore(st.get("ranges", {}))
+
+class _Track:
+    """Streaming indicator set for one (coin, interval)."""
+    def __init__(self, ema_periods):
+        self.last_t = None # Time of the last committed (closed) bar
+        self.bars = 0
+        self.emas = {p: StreamingEMA(p) for p in ema_periods}
+        self.rsi = StreamingRSI(14)
+        self.atr = StreamingATR(14)
+        self.volume = StreamingMean(10)
+
+    def push(self, t, h, l, c, v):
+        for e in self.emas.values(): e.push(c)
+        self.rsi.push(c)
+        self.atr.push(h, l, c)
+        self.volume.push(v)
+        self.last_t = t
+        self.bars += 1
+
+    def peek(self, h, l, c, v):
+        snap = {
+            "price": c,
+            "rsi": self.rsi.peek(c),
+            "atr": self.atr.peek(h, l),
+            "vol_avg": self.volume.mean(),
+            "vol_avg_incl": self.volume.peek(v),
+            "bars": self.bars + 1,
+        }
+        for p, e in self.emas.items(): snap[f"ema_{p}"] = e.peek(c)
+        return snap
+
+    def state(self):
+        return {
+            "last_t": self.last_t, "bars": self.bars,
+            "emas": {str(p): e.state() for p, e in self.emas.items()},
+            "rsi": self.rsi.state(), "atr": self.atr.state(), "volume": self.volume.state()
+        }
+
+    def restore(self, st):
+        self.last_t = st.get("last_t")
+        self.bars = st.get("bars", 0)
+        for p, e in self.emas.items(): e.restore(st.get("emas", {}).get(str(p), {}))
+        self.rsi.restore(st.get("rsi", {}))
+        self.atr.restore(st.get("atr", {}))
+        self.volume.restore(st.get("volume", {}))
+
+class IndicatorBank:
+    """
+    Streaming indicators per (coin, interval), fed with the same candle windows
+    the organs see (oldest first, last bar still forming).
+    Cost per update is constant regardless of EMA length; state can be
+    checkpointed so restarts resume without a long warm-up fetch.
+    """
+    def __init__(self, path=None, ema_periods=(20, 50, 200), save_every=60.0):
+        self.path = path
+        self.ema_periods = tuple(ema_periods)
+        self.save_every = save_every
+        self.last_save = time.time()
+        self.tracks = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def update(self, coin, interval, candles):
+        """Commits newly closed bars, then returns a snapshot with the live bar applied."""
+        if not candles: return None
+        if not isinstance(candles, Candles): candles = Candles.from_rows(candles)
+        key = f"{coin}|{interval}"
+        t, h, l, c, v = candles.t, candles.h, candles.l, candles.c, candles.v
+        n = len(t)
+        with self.lock:
+            track = self.tracks.get(key)
+            # No overlap with what we know (first run, or a gap) -> rebuild from the window
+            if track is None or track.last_t is None or t[0] > track.last_t:
+                track = _Track(self.ema_periods)
+                self.tracks[key] = track
+
+            start = 0 if track.last_t is None else int(np.searchsorted(t[:-1], track.last_t, side='right'))
+            for i in range(start, n - 1):
+                track.push(int(t[i]), float(h[i]), float(l[i]), float(c[i]), float(v[i]))
+            return track.peek(float(h[-1]), float(l[-1]), float(c[-1]), float(v[-1]))
+
+    # --- CHECKPOINT ---
+    def load(self):
+        if not self.path or not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r') as f: raw = json.load(f)
+            if raw.get("ema_periods") != list(self.ema_periods): return
+            for key, st in raw.get("tracks", {}).items():
+                track = _Track(self.ema_periods)
+                track.restore(st)
+                self.tracks[key] = track
+            print(f">> INDICATORS RESTORED ({len(self.tracks)} tracks)")
+        except Exception as e:
+            print(f"xx INDICATOR STATE LOAD FAILED: {e}")
+
+    def save(self):
+        if not self.path: return
+        with self.lock:
+            raw = {
+                "ema_periods": list(self.ema_periods),
+                "tracks": {key: track.state() for key, track in self.tracks.items()}
+            }
+        try:
+            temp = self.path + ".tmp"
+            with open(temp, 'w') as f: json.dump(raw, f)
+            os.replace(temp, self.path)
+            self.last_save = time.time()
+        except Exception as e:
+            print(f"xx INDICATOR STATE SAVE FAILED: {e}")
+
+    def maybe_save(self):
+        """Checkpoints at most once per `save_every` seconds."""
+        if time.time() - self.last_save >= self.save_every:
+            self.save()
@@ -0,0 +1,163 @@
+import copy
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+FSYNC_POLICIES = ("always", "batch", "never")
+
+class TradeJournal:
+    """
+    Append-only trade log on the data volume.
+    trades.jsonl gets one line per closed trade (O(1) append, full history).
+    stats.json holds compacted rolling aggregates (wins/losses, PnL by coin and
+    by signal, the last `history` trades for the dashboard) plus the journal
+    offset they cover, so a crash between the two writes is replayed on boot.
+    fsync: "always" (every trade), "batch" (within `fsync_every` s of a trade), "never".
+    """
+    def __init__(self, data_dir, fsync="batch", fsync_every=5.0, history=50, persist=True):
+        if fsync not in FSYNC_POLICIES: raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.JOURNAL_FILE = os.path.join(data_dir, "trades.jsonl")
+        self.STATS_FILE = os.path.join(data_dir, "stats.json")
+        self.fsync = fsync
+        self.fsync_every = fsync_every
+        self.history = history
+        self.persist = persist # False = in-memory only (backtests)
+        self.lock = threading.Lock()
+        self.last_sync = 0.0
+        self.sync_timer = None # Deferred fsync for "batch" when trades go quiet
+        self.stats = self._load()
+
+    @staticmethod
+    def _empty():
+        return {"wins": 0, "losses": 0, "pnl": 0.0, "history": [], "by_coin": {}, "by_signal": {}, "journal_offset": 0}
+
+    # --- WRITE ---
+    def record(self, coin, pnl, outcome, signal=None, roi=None, entry=None, size=None):
+        trade = {
+            "ts": round(time.time(), 3),
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "coin": coin, "pnl": round(pnl, 2), "outcome": outcome,
+            "signal": signal or "UNKNOWN",
+            "roi": round(roi, 2) if roi is not None else None,
+            "entry": entry, "size": size,
+        }
+        with self.lock:
+            if self.persist:
+                try:
+                    with open(self.JOURNAL_FILE, 'a') as f:
+                        f.write(json.dumps(trade) + "\n")
+                        f.flush()
+                        if self.fsync == "always" or (self.fsync == "batch" and time.time() - self.last_sync >= self.fsync_every):
+                            os.fsync(f.fileno())
+                            self.last_sync = time.time()
+                        elif self.fsync == "batch" and self.sync_timer is None:
+                            delay = self.fsync_every - (time.time() - self.last_sync)
+                            self.sync_timer = threading.Timer(delay, self._deferred_sync)
+                            self.sync_timer.daemon = True
+                            self.sync_timer.start()
+                        self.stats['journal_offset'] = f.tell()
+                except Exception as e:
+                    print(f"xx JOURNAL WRITE FAILED: {e}")
+            self._apply(self.stats, trade)
+            self._save()
+        return trade
+
+    def _deferred_sync(self):
+        """Timer: fsyncs trades appended since the last sync."""
+        with self.lock:
+            self.sync_timer = None
+            self._fsync()
+
+    def _fsync(self):
+        try:
+            with open(self.JOURNAL_FILE, 'a') as f: os.fsync(f.fileno())
+            self.last_sync = time.time()
+        except Exception as e:
+            print(f"xx JOURNAL FSYNC FAILED: {e}")
+
+    def flush(self):
+        """Fsyncs anything still pending (shutdown)."""
+        with self.lock:
+            if self.sync_timer: self.sync_timer.cancel()
+            self.sync_timer = None
+            if self.persist and self.fsync != "never" and os.path.exists(self.JOURNAL_FILE): self._fsync()
+
+    def _apply(self, stats, trade):
+        """Folds one trade into the aggregates."""
+        win = trade['outcome'] == "WIN"
+        stats['wins' if win else 'losses'] += 1
+        stats['pnl'] = round(stats.get('pnl', 0.0) + trade['pnl'], 2)
+        stats['history'].insert(0, {k: trade[k] for k in ("coin", "pnl", "time", "outcome", "signal")})
+        del stats['history'][self.history:]
+        for bucket, key in (("by_coin", trade['coin']), ("by_signal", trade['signal'])):
+            row = stats.setdefault(bucket, {}).setdefault(key, {"trades": 0, "wins": 0, "pnl": 0.0})
+            row['trades'] += 1
+            row['wins'] += 1 if win else 0
+            row['pnl'] = round(row['pnl'] + trade['pnl'], 2)
+
+    def _save(self):
+        if not self.persist: return
+        try:
+            temp = self.STATS_FILE + ".tmp"
+            with open(temp, 'w') as f: json.dump(self.stats, f)
+            os.replace(temp, self.STATS_FILE)
+        except Exception as e:
+            print(f"xx STATS SAVE FAILED: {e}")
+
+    # --- LOAD / RECOVERY ---
+    def _load(self):
+        stats = self._empty()
+        if not self.persist: return stats
+        if os.path.exists(self.STATS_FILE):
+            try:
+                with open(self.STATS_FILE, 'r') as f: stats.update(json.load(f))
+            except Exception:
+                pass
+
+        # Replay journal lines the aggregates have not seen (crash after append)
+        offset = stats.get('journal_offset', 0)
+        if os.path.exists(self.JOURNAL_FILE) and os.path.getsize(self.JOURNAL_FILE) > offset:
+            replayed, torn = 0, False
+            with open(self.JOURNAL_FILE, 'r') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith("\n"): torn = True; break
+                    try: self._apply(stats, json.loads(line))
+                    except Exception: pass
+                    offset += len(line.encode())
+                    replayed += 1
+            if torn:
+                # Half-written last line from a crash: drop it so the next append starts clean
+                with open(self.JOURNAL_FILE, 'r+b') as f: f.truncate(offset)
+            stats['journal_offset'] = offset
+            if replayed:
+                print(f">> JOURNAL: Replayed {replayed} trade(s) into stats")
+                self.stats = stats
+                self._save()
+        return stats
+
+    # --- QUERIES ---
+    def aggregates(self):
+        """Totals without the history list."""
+        with self.lock:
+            total = self.stats['wins'] + self.stats['losses']
+            return {
+                "trades": total, "wins": self.stats['wins'], "losses": self.stats['losses'],
+                "win_rate": round(self.stats['wins'] / total * 100, 1) if total else 0.0,
+                "pnl": self.stats.get('pnl', 0.0),
+                "by_coin": copy.deepcopy(self.stats.get('by_coin', {})),
+                "by_signal": copy.deepcopy(self.stats.get('by_signal', {})),
+            }
+
+    def trades(self, since=None, coin=None):
+        """Streams full trade records from the journal (for analytics)."""
+        if not self.persist or not os.path.exists(self.JOURNAL_FILE): return
+        with open(self.JOURNAL_FILE, 'r') as f:
+            for line in f:
+                try: trade = json.loads(line)
+                except Exception: continue
+                if since is not None and trade.get('ts', 0) < since: continue
+                if coin is not None and trade.get('coin') != coin: continue
+                yield trade
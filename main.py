@@ -2,19 +2,32 @@ import time
 import json
 import sys
 import os
+import atexit
+import signal
+import threading
 import warnings
 from collections import deque
 from datetime import datetime, timezone
 
 # IMPORT MODULES
 try:
-    from vision import Vision
+    from vision import Vision, info_weight
+    from retina import Retina
+    from archive import CandleArchive, INTERVAL_MS
+    from atlas import Atlas
     from predator import Predator
     from deep_sea import DeepSea
     from xenomorph import Xenomorph
     from smart_money import SmartMoney
-    from hands import Hands
+    from hands import Hands, OrderPipeline
     from messenger import Messenger
+    from hologram import StatePublisher
+    from scribe import Scribe
+    from telemetry import METRICS
+    from fleet import FLEET_CONFIG, STARTING_EQUITY, scan_coin
+    from chronos import Scheduler, once
+    from historian import Historian
+    import indicators
     # from seasonality import Seasonality 
 except ImportError as e:
     print(f">> CRITICAL ERROR: Missing Module {e}")
@@ -29,21 +42,29 @@ DATA_DIR = "/app/data" if os.path.exists("/app/data") else "."
 if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR, exist_ok=True)
 
 DASHBOARD_FILE = os.path.join(DATA_DIR, "dashboard_state.json")
+INDICATOR_FILE = os.path.join(DATA_DIR, "indicator_state.json") # Streaming indicator checkpoint
+CANDLE_DIR = os.path.join(DATA_DIR, "candles") # Local candle archive
+META_FILE = os.path.join(DATA_DIR, "asset_meta.json") # Asset metadata cache
 LOG_FILE = os.path.join(DATA_DIR, "system.log") # Permanent Memory
-STARTING_EQUITY = 412.0 
-
-# [BLUEPRINT] High-Volatility Fleet
-FLEET_CONFIG = {
-    "SOL":   {"type": "PRINCE", "lev": 5},
-    "SUI":   {"type": "PRINCE", "lev": 5},
-    "BNB":   {"type": "PRINCE", "lev": 5},
-    "WIF":   {"type": "MEME",   "lev": 5},
-    "DOGE":  {"type": "MEME",   "lev": 5},
-    "PENGU": {"type": "MEME",   "lev": 5}
-}
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.json") # Loop telemetry (spans, counters)
+PROFILE_FLAG = os.path.join(DATA_DIR, "profile.on") # Touch to start the sampling profiler, delete to stop
 
 EVENT_QUEUE = deque(maxlen=50) 
 
+# Scanner concurrency (HTTP is shared-budgeted inside Vision)
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", 8))
+SCAN_DEADLINE = float(os.environ.get("SCAN_DEADLINE", 8.0)) # Seconds per tick
+
+# Live WebSocket feed for Vision (REST polling if disabled or stale)
+STREAM_ENABLED = os.environ.get("VISION_STREAM", "1") == "1"
+
+# Event-driven scheduler: scan on candle close, price moves or position changes
+MOVE_TRIGGER_PCT = float(os.environ.get("MOVE_TRIGGER_PCT", 0.3)) # % move since a coin's last scan
+MAX_IDLE = float(os.environ.get("MAX_IDLE", 15.0)) # Account/dashboard refresh when nothing happens
+
+# Optional localhost metrics endpoint (metrics.json is always written)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+
 # ==========================================
 # 2. HELPER FUNCTIONS
 # ==========================================
@@ -60,48 +81,49 @@ def load_config():
         except: return None
     return {"wallet_address": wallet, "private_key": pk}
 
-def log_permanent(message):
-    """Writes logs to disk for permanent memory."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    try:
-        with open(LOG_FILE, "a") as f:
-            f.write(f"[{timestamp}] {message}\n")
-    except: pass
+SCRIBE = None
+SCRIBE_LOCK = threading.Lock() # Called from the main loop and the chronos job threads
 
-def save_dashboard_state(mode, session, equity, cash, positions, scan_results, logs, secured_coins):
+def log_permanent(message, **fields):
     """
-    STABILITY PATCH: Includes retry logic to prevent crashes 
-    if the Dashboard is reading the file simultaneously.
+    Permanent memory: structured JSON record in system.log (rotated + gzipped).
+    Never blocks - the Scribe thread does the disk I/O.
+    fields: coin, signal, equity, latency_ms, kind, level...
     """
-    try:
-        pnl = equity - STARTING_EQUITY
-        roe = (pnl / STARTING_EQUITY) * 100
-        dash_state = {
-            "mode": mode, "session": session,
-            "equity": round(equity, 2), "cash": round(cash, 2),
-            "pnl": round(pnl, 2), "account_roe": round(roe, 2),
-            "positions": positions, "scan_results": scan_results,
-            "logs": list(logs), "secured_coins": secured_coins
-        }
-        
-        temp = DASHBOARD_FILE + ".tmp"
-        # 1. Write to temp
-        with open(temp, 'w') as f: json.dump(dash_state, f)
-        
-        # 2. Atomic Replace with Retry
-        max_retries = 5
-        for i in range(max_retries):
-            try:
-                os.replace(temp, DASHBOARD_FILE)
-                break
-            except PermissionError:
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"xx SAVE ERROR: {e}")
-                break
-                
-    except Exception as e:
-        print(f"xx STATE ERROR: {e}")
+    global SCRIBE
+    if SCRIBE is None:
+        with SCRIBE_LOCK:
+            if SCRIBE is None: SCRIBE = Scribe(LOG_FILE) # Exactly one writer per file
+    SCRIBE.log(message, **fields)
+
+def dashboard_state(mode, session, equity, cash, positions, scan_results, logs, secured_coins):
+    """Snapshot for the dashboard (published through the Hologram writer)."""
+    pnl = equity - STARTING_EQUITY
+    roe = (pnl / STARTING_EQUITY) * 100
+    return {
+        "mode": mode, "session": session,
+        "equity": round(equity, 2), "cash": round(cash, 2),
+        "pnl": round(pnl, 2), "account_roe": round(roe, 2),
+        "positions": list(positions), "scan_results": list(scan_results),
+        "logs": list(logs), "secured_coins": list(secured_coins)
+    }
+
+def drain_order_reports(pipeline, deep_sea=None):
+    """Moves order acks/fills from the pipeline into the event feed."""
+    for r in pipeline.drain():
+        t = datetime.now().strftime("%H:%M:%S")
+        if r['status'] == "filled":
+            if deep_sea:
+                deep_sea.note_entry(r['coin'], r.get('tag'))
+                deep_sea.request_sync() # Start guarding the new position right away
+            msg = f"[{t}] ✅ FILLED {r['side']} {r['coin']}: {r['filled_sz']} @ {r['avg_px']} ({r['ack_ms']}ms)"
+        elif r['status'] in ("resting", "acked"):
+            msg = f"[{t}] 📨 {r['status'].upper()} {r['side']} {r['coin']} ({r['ack_ms']}ms)"
+        else:
+            msg = f"[{t}] ❌ ORDER {r['status'].upper()} {r['side']} {r['coin']}: {r.get('error')}"
+        EVENT_QUEUE.append(msg)
+        log_permanent(msg, kind="order", coin=r['coin'], side=r['side'], status=r['status'],
+                      signal=r.get('tag'), size_usd=r['size_usd'], latency_ms=r['ack_ms'])
 
 # ==========================================
 # 3. MAIN LOOP
@@ -110,8 +132,22 @@ def main():
     print(">> SYSTEM BOOT: LUMA SINGULARITY (70/30 ALLOCATION ACTIVE)")
     
     conf = load_config()
-    hands = Hands(config=conf)
-    vision = Vision()
+    METRICS.start_exporter(METRICS_FILE, profile_flag=PROFILE_FLAG)
+    if METRICS_PORT: METRICS.serve(METRICS_PORT)
+    vision = Vision(fetch_workers=SCAN_WORKERS, archive=CandleArchive(CANDLE_DIR))
+    atlas = Atlas(vision.get_meta, path=META_FILE)
+    # Orders price off Vision's mid cache instead of an allMids call each
+    hands = Hands(config=conf, price_source=vision.mids, atlas=atlas)
+    pipeline = OrderPipeline(hands)
+    bank = indicators.IndicatorBank(INDICATOR_FILE)
+    # Dashboard snapshots: coalesced, rate-limited, written off the main thread
+    hologram = StatePublisher(DASHBOARD_FILE)
+    if STREAM_ENABLED:
+        retina = Retina()
+        retina.subscribe_mids()
+        retina.subscribe_user(hands.wallet_address)
+        vision.attach_stream(retina)
+        retina.start()
     predator = Predator()
     deep_sea = DeepSea()
     xenomorph = Xenomorph()
@@ -120,41 +156,82 @@ def main():
     # Initialize Messenger (Reads Railway Vars)
     messenger = Messenger() 
 
+    # Stops/trailing run on their own fast loop, not once per scan cycle
+    if hands and hands.exchange:
+        deep_sea.start(hands, vision, FLEET_CONFIG, hands.wallet_address)
+
+    # The loop wakes on events instead of a fixed sleep
+    prices_live = lambda: bool(vision.stream and vision.stream.is_fresh("allMids"))
+    # REST fallback: full-fleet scans may use half the info weight budget (the rest is risk/housekeeping)
+    scan_weight = len(FLEET_CONFIG) * info_weight("candleSnapshot") + info_weight("clearinghouseState")
+    blind_idle = max(3.0, vision.budget.period(scan_weight, share=0.5))
+    scheduler = Scheduler(FLEET_CONFIG, prices=vision.mids, prices_live=prices_live, intervals=("15m",),
+                          move_pct=MOVE_TRIGGER_PCT, max_idle=MAX_IDLE, blind_idle=blind_idle)
+    # Only real position changes (fills, accepted exits) - not acks or exit retries
+    scheduler.watch("position", once(pipeline.filled, deep_sea.closed))
+
+    # Housekeeping on its own cadences (off the trading thread, each with a deadline)
+    historian = Historian()
+    market = {"regime": "NEUTRAL"}
+    def update_regime():
+        regime = historian.check_regime(vision.get_candles("BTC", "1d"))
+        METRICS.gauge("regime_multiplier", regime['multiplier'])
+        if regime['regime'] != market['regime']:
+            t = datetime.now().strftime("%H:%M:%S")
+            msg = f"[{t}] 🏛️ REGIME: {market['regime']} -> {regime['regime']}"
+            EVENT_QUEUE.append(msg)
+            log_permanent(msg, kind="regime", regime=regime['regime'])
+        market.update(regime)
+    def aggregate_stats():
+        agg = deep_sea.journal.aggregates()
+        METRICS.gauge("trades.total", agg['trades'])
+        METRICS.gauge("trades.win_rate", agg['win_rate'])
+        METRICS.gauge("trades.pnl", agg['pnl'])
+    scheduler.every("historian", 3600, update_regime, deadline=30, run_now=True)
+    scheduler.every("atlas", atlas.refresh_every, atlas.refresh, deadline=30)
+    scheduler.every("stats", 60, aggregate_stats, deadline=5, run_now=True)
+    scheduler.start_jobs()
+
     equity = STARTING_EQUITY
     cash = 0.0
     positions = []
     mode = "STANDARD"
 
+    # Final writes on exit (Railway sends SIGTERM on redeploy)
+    def shutdown():
+        print(">> SHUTDOWN: Flushing state...")
+        deep_sea.stop() # Forces the ratchet checkpoint
+        deep_sea.journal.flush()
+        bank.save()
+        hologram.flush()
+        log_permanent("System Shutdown.", kind="shutdown", equity=equity)
+        SCRIBE.flush()
+        messenger.flush(timeout=5)
+    atexit.register(shutdown)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0)) # Unwinds the loop, then atexit runs
+
+    radar = {} # coin -> latest scan result (coins are only rescanned when triggered)
+
     # Initial Log & Discord Alert
-    log_permanent("System Booted. 70/30 Allocation Active.")
+    log_permanent("System Booted. 70/30 Allocation Active.", kind="boot", equity=equity)
     messenger.send_info(f"Luma Online. Mode: {mode}. Equity: ${equity}")
 
     while True:
         try:
+            trigger = scheduler.wait()
+            tick_started = time.perf_counter()
+
             # --- A. UPDATE ACCOUNT ---
             wallet = hands.wallet_address if hands else None
-            acct = vision.get_user_state(wallet)
+            with METRICS.span("tick.account"):
+                acct = vision.get_user_state(wallet)
             
             if acct:
                 equity = float(acct.get("marginSummary", {}).get("accountValue", equity))
                 cash = float(acct.get("withdrawable", 0.0))
-                raw_pos = acct.get("assetPositions", [])
-                
-                positions = []
-                for p in raw_pos:
-                    pos = p.get("position", {})
-                    sz = float(pos.get("szi", 0))
-                    if sz != 0:
-                        # Direct API Fetch for Margin (No Calculation)
-                        margin_used = float(pos.get("marginUsed", 0.0))
-                        
-                        positions.append({
-                            "coin": pos.get("coin"), 
-                            "size": sz,
-                            "entry": float(pos.get("entryPx", 0)),
-                            "pnl": float(pos.get("unrealizedPnl", 0)),
-                            "margin": margin_used 
-                        })
+                positions = vision.parse_positions(acct)
+                pipeline.reconcile({p['coin'] for p in positions})
+            drain_order_reports(pipeline, deep_sea)
 
             # --- B. DETERMINE MODE & LEVERAGE ---
             current_roe = ((equity - STARTING_EQUITY) / STARTING_EQUITY) * 100
@@ -172,57 +249,57 @@ def main():
                     cfg['lev'] = 10 if is_god_mode else 5
                 else:
                     cfg['lev'] = 5
+                # Never above what the exchange allows for this coin
+                cfg['lev'] = min(cfg['lev'], atlas.max_leverage(coin_name, cfg['lev']))
 
             session = "LONDON/NY" 
 
-            # --- C. SCANNER LOOP ---
-            scan_data = []
-            for coin in FLEET_CONFIG:
+            # --- C. SCANNER (CONCURRENT) ---
+            # All coins are fetched in one bulk call; each coin is scored and
+            # acted on here, on the main thread, the moment its candles arrive.
+            # Only the coins the trigger named are rescanned (none on a heartbeat)
+            t = datetime.now().strftime("%H:%M:%S")
+            if trigger['coins']:
+                msg = f"[{t}] 🔍 SCANNING {len(trigger['coins'])}/{len(FLEET_CONFIG)} ({', '.join(trigger['reasons'][:3])})..."
+                print(f">> {msg}")
+                current_logs = list(EVENT_QUEUE)
+                current_logs.insert(0, msg)
+                hologram.publish(dashboard_state(mode, session, equity, cash, positions, list(radar.values()), current_logs, deep_sea.secured_coins))
+
+            pairs = [(coin, "15m") for coin in trigger['coins']]
+            scanned = {}
+            scan_started = time.perf_counter()
+            for (coin, _), candles in vision.iter_candles(pairs, timeout=SCAN_DEADLINE):
                 try:
-                    # Heartbeat
+                    # Close scan: the newest bar opened ~2s ago (no volume yet), so the organs
+                    # judge the bar that just closed - same as the backtest's bar-close replay
+                    closed_bar = (trigger['closed'] and len(candles) > 1
+                                  and int(candles.t[-1]) + INTERVAL_MS["15m"] > time.time() * 1000)
+                    if closed_bar: candles = candles[:-1]
+                    with METRICS.span(f"scan.{coin}"): # Organs only (fetch time is in http.*)
+                        result = scan_coin(coin, candles, smart_money, xenomorph, bank)
+                    if not result: continue
+                    radar[coin] = result
+                    scanned[coin] = result['price']
+
                     t = datetime.now().strftime("%H:%M:%S")
-                    msg = f"[{t}] 🔍 SCANNING {coin}..."
-                    print(f">> {msg}")
-                    
-                    # Update Dashboard State frequently
-                    current_logs = list(EVENT_QUEUE)
-                    current_logs.insert(0, msg)
-                    save_dashboard_state(mode, session, equity, cash, positions, scan_data, current_logs, deep_sea.secured_coins)
-
-                    # Fetch Data
-                    candles = vision.get_candles(coin, "15m")
-                    if not candles: continue
-                    
-                    curr_price = float(candles[-1]['c'])
-                    c_type = FLEET_CONFIG[coin]['type']
-
-                    # 1. Smart Money Signal
-                    sm_sig = smart_money.hunt_turtle(candles, coin_type=c_type)
-                    quality = "NEUTRAL"
-                    if sm_sig: quality = sm_sig['type'] 
-
-                    # 2. Xenomorph Override
-                    xeno_sig = xenomorph.hunt(coin, candles)
-                    if xeno_sig == "ATTACK": quality = "⚔️ BREAKOUT"
-
-                    scan_data.append({
-                        "coin": coin, "price": curr_price,
-                        "vol_m": round(float(candles[-1]['v'])/1000000, 2),
-                        "quality": quality
-                    })
-                    
+                    quality = result['quality']
+                    curr_price = result['price']
+                    if not closed_bar: vision.mids.set(coin, curr_price) # Keeps Hands/DeepSea pricing warm without allMids
+
                     # --- D. EXECUTION LOGIC ---
                     is_buy = "BUY" in str(quality) or "BREAKOUT" in str(quality)
                     is_sell = "SELL" in str(quality)
 
                     if is_buy or is_sell:
+                        METRICS.incr("signals")
                         # Log to System
                         log_msg = f"[{t}] ⚡ SIGNAL: {coin} | {quality}"
                         EVENT_QUEUE.append(log_msg)
-                        log_permanent(log_msg)
+                        log_permanent(log_msg, kind="signal", coin=coin, signal=str(quality), price=curr_price, equity=equity)
                         
                         # DYNAMIC SIZING (70/30 Rule)
-                        alloc_size_usd = smart_money.calculate_position_size(equity)
+                        alloc_size_usd = smart_money.calculate_position_size(equity, slots=len(FLEET_CONFIG))
                         
                         # [ACTION] Send Targeted Discord Alert
                         messenger.send_trade(
@@ -234,39 +311,55 @@ def main():
                         
                         active_coins = [p['coin'] for p in positions]
                         
-                        if coin not in active_coins and alloc_size_usd > 5:
+                        # In-flight/settling orders count as active (no duplicate entries)
+                        if coin not in active_coins and not pipeline.is_busy(coin) and alloc_size_usd > 5:
                             if hands:
                                 side = "BUY" if is_buy else "SELL"
                                 print(f">> 🔫 FIRING {side}: {coin} (Size: ${alloc_size_usd})")
                                 
-                                # Execute Order
-                                hands.place_market_order(coin, side, alloc_size_usd)
-                                log_permanent(f"Executed {side} on {coin} for ${alloc_size_usd}")
+                                # Execute Order (non-blocking; the ack lands in the event feed)
+                                if pipeline.submit(coin, side, alloc_size_usd, price=curr_price, tag=str(quality)):
+                                    log_permanent(f"Submitted {side} on {coin} for ${alloc_size_usd}", kind="order", coin=coin,
+                                                  side=side, status="submitted", signal=str(quality), size_usd=alloc_size_usd, equity=equity)
                         else:
                             print(f">> ⚠️ SKIPPING: Active or Low Equity (${alloc_size_usd})")
 
-                    time.sleep(0.5)
                 except Exception as e:
+                    METRICS.incr("scan.errors")
                     print(f"xx SCAN ERROR {coin}: {e}")
+            if pairs: METRICS.observe("tick.scan", (time.perf_counter() - scan_started) * 1000)
+            scheduler.scanned(scanned) # Move triggers measure from here
+
+            # Keep the radar in fleet order regardless of arrival order
+            scan_data = [radar[coin] for coin in FLEET_CONFIG if coin in radar]
+            drain_order_reports(pipeline, deep_sea)
 
             # --- E. RISK MANAGEMENT ---
-            risk_logs = deep_sea.manage_positions(hands, positions, FLEET_CONFIG, vision)
+            # Exits fire from DeepSea's own loop; here we only report what it did
+            t = datetime.now().strftime("%H:%M:%S")
+            risk_logs = deep_sea.drain_events()
             if risk_logs:
                 for log in risk_logs: 
                     full_log = f"[{t}] {log}"
                     EVENT_QUEUE.append(full_log)
-                    log_permanent(full_log)
+                    log_permanent(full_log, kind="risk", equity=equity)
                     # Notify Discord of Risk Actions (Stops/Secures)
                     messenger.send_info(f"Risk Event: {log}")
 
-            save_dashboard_state(mode, session, equity, cash, positions, scan_data, EVENT_QUEUE, deep_sea.secured_coins)
-            
-            # Sleep 3s before next full cycle
-            time.sleep(3)
+            with METRICS.span("tick.publish"):
+                hologram.publish(dashboard_state(mode, session, equity, cash, positions, scan_data, EVENT_QUEUE, deep_sea.secured_coins))
+            with METRICS.span("tick.indicator_save"):
+                bank.maybe_save()
+
+            METRICS.observe("tick.total", (time.perf_counter() - tick_started) * 1000) # Work only, not the wait
+            METRICS.gauge("equity", round(equity, 2))
+            METRICS.gauge("positions", len(positions))
+            METRICS.gauge("orders_in_flight", len(pipeline.busy_coins()))
 
         except Exception as e:
+            METRICS.incr("tick.errors")
             print(f"xx MAIN ERROR: {e}")
-            log_permanent(f"CRITICAL MAIN LOOP ERROR: {e}")
+            log_permanent(f"CRITICAL MAIN LOOP ERROR: {e}", kind="error", level="error")
             messenger.send_error(f"Main Loop Crash: {e}")
             time.sleep(10)
 
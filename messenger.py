@@ -1,33 +1,157 @@
-import json
 import os
-import subprocess
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+import requests
+
 class Messenger:
-    def __init__(self):
+    """
+    Discord delivery through one background worker.
+    send_*() only queue an embed. The worker batches queued embeds per channel
+    (up to MAX_EMBEDS per message), posts them over a pooled session,
+    honours Discord's 429 retry_after and bucket headers, and coalesces
+    duplicate alerts. When the queue is full new messages are dropped and
+    reported in a summary instead of slowing the trading loop.
+    """
+    MAX_EMBEDS = 10 # Discord limit per webhook message
+
+    def __init__(self, webhooks=None, max_queue=200, batch_window=1.0, dedupe_window=60.0, timeout=10, retries=3):
         print(">> Messenger (Discord) Loaded")
-        # Load from Env Vars (Railway)
-        self.webhooks = {
+        # Load from Env Vars (Railway); injectable for tests / local stubs
+        self.webhooks = webhooks if webhooks is not None else {
             "trades": os.environ.get("DISCORD_TRADES"),
             "errors": os.environ.get("DISCORD_ERRORS"),
             "info":   os.environ.get("DISCORD_INFO")
         }
+        self.max_queue = max_queue
+        self.batch_window = batch_window
+        self.dedupe_window = dedupe_window
+        self.timeout = timeout
+        self.retries = retries
+
+        self.session = requests.Session() # Keep-alive per webhook host
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending = OrderedDict() # (channel, title, description) -> {"channel", "embed", "count"}
+        self.recent = {}             # same key -> time it was sent (duplicate suppression)
+        self.dropped = {}            # channel -> messages dropped under backpressure
+        self.blocked_until = {}      # url -> time the rate-limit bucket reopens
+        self.sending = False
+        self.stats = {"sent": 0, "messages": 0, "coalesced": 0, "dropped": 0, "rate_limited": 0, "failed": 0}
+
+        self.thread = threading.Thread(target=self._worker, name="messenger", daemon=True)
+        self.thread.start()
 
+    # --- QUEUE ---
     def _send_payload(self, channel, payload):
-        """Internal method to send data via Curl (Robustness)"""
-        url = self.webhooks.get(channel)
-        if not url: return
-
-        try:
-            # Using Curl for maximum container compatibility
-            subprocess.Popen([
-                "curl", "-H", "Content-Type: application/json",
-                "-d", json.dumps(payload),
-                url
-            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except Exception as e:
-            print(f"xx MSG FAILED: {e}")
+        """Queues the payload's embeds for delivery (never blocks on the network)."""
+        if not self.webhooks.get(channel): return
+        with self.lock:
+            now = time.time()
+            for embed in payload.get("embeds", []):
+                key = (channel, embed.get("title"), embed.get("description"))
+                if key in self.pending:
+                    self.pending[key]['count'] += 1
+                    self.stats['coalesced'] += 1
+                elif now - self.recent.get(key, 0) < self.dedupe_window:
+                    self.stats['coalesced'] += 1 # Same alert just went out
+                elif len(self.pending) >= self.max_queue:
+                    self.dropped[channel] = self.dropped.get(channel, 0) + 1
+                    self.stats['dropped'] += 1
+                else:
+                    self.pending[key] = {"channel": channel, "embed": embed, "count": 1}
+            self.wakeup.notify()
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.dropped: self.wakeup.wait()
+            time.sleep(self.batch_window) # Let a burst collect into one message
+            with self.lock:
+                items = list(self.pending.items())
+                self.pending.clear()
+                dropped, self.dropped = self.dropped, {}
+                self.sending = True
+                now = time.time()
+                self.recent = {k: t for k, t in self.recent.items() if now - t < self.dedupe_window}
+                for key, _ in items: self.recent[key] = now
+            try:
+                self._deliver(items, dropped)
+            finally:
+                with self.lock: self.sending = False
+
+    def _deliver(self, items, dropped):
+        by_channel = OrderedDict()
+        for key, item in items:
+            embed = dict(item['embed'])
+            if item['count'] > 1:
+                embed['footer'] = {"text": f"{embed.get('footer', {}).get('text', '')} (x{item['count']})".strip()}
+            by_channel.setdefault(item['channel'], []).append(embed)
+        for channel, count in dropped.items():
+            by_channel.setdefault(channel, []).append({
+                "title": "⚠️ Alerts Dropped",
+                "description": f"{count} message(s) dropped under backpressure.",
+                "color": 15105570, # Orange
+            })
+
+        for channel, embeds in by_channel.items():
+            url = self.webhooks.get(channel)
+            if not url: continue
+            for i in range(0, len(embeds), self.MAX_EMBEDS):
+                chunk = embeds[i:i + self.MAX_EMBEDS]
+                if self._post(url, {"username": "Luma Guardian", "embeds": chunk}):
+                    self.stats['sent'] += len(chunk)
+                    self.stats['messages'] += 1
+                else:
+                    self.stats['failed'] += len(chunk)
 
+    def _post(self, url, payload):
+        for attempt in range(self.retries + 1):
+            wait = self.blocked_until.get(url, 0) - time.time()
+            if wait > 0: time.sleep(wait)
+            try:
+                resp = self.session.post(url, json=payload, timeout=self.timeout)
+            except Exception as e:
+                print(f"xx MSG FAILED: {e}")
+                time.sleep(min(2 ** attempt, 10))
+                continue
+
+            # Bucket exhausted: hold the next send until it resets
+            if resp.headers.get("X-RateLimit-Remaining") == "0":
+                try: self.blocked_until[url] = time.time() + float(resp.headers.get("X-RateLimit-Reset-After", 0))
+                except ValueError: pass
+
+            if resp.status_code == 429:
+                self.stats['rate_limited'] += 1
+                self.blocked_until[url] = time.time() + self._retry_after(resp)
+                continue
+            if resp.status_code >= 500:
+                time.sleep(min(2 ** attempt, 10))
+                continue
+            if resp.status_code >= 400:
+                print(f"xx MSG REJECTED ({resp.status_code}): {resp.text[:120]}")
+                return False
+            return True
+        return False
+
+    def _retry_after(self, resp):
+        try: return float(resp.json().get("retry_after", 1.0))
+        except Exception: pass
+        try: return float(resp.headers.get("Retry-After", 1.0))
+        except (TypeError, ValueError): return 1.0
+
+    def flush(self, timeout=10.0):
+        """Waits (bounded) until everything queued has been delivered."""
+        end = time.time() + timeout
+        while time.time() < end:
+            with self.lock:
+                if not self.pending and not self.dropped and not self.sending: return True
+            time.sleep(0.05)
+        return False
+
+    # --- MESSAGES ---
     def send_info(self, message):
         """Called by main.py for startup/status updates"""
         payload = {
@@ -58,9 +182,9 @@ class Messenger:
         """Called by main.py for Buy/Sell signals"""
         is_buy = "BUY" in signal or "BREAKOUT" in signal
         color = 5763719 if is_buy else 15548997 # Green vs Red
-        
+
         msg = f"**SIGNAL:** {signal}\n**PRICE:** ${price}\n**SIZE:** ${size}"
-        
+
         payload = {
             "username": "Luma Guardian",
             "embeds": [{
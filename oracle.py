@@ -1,43 +1,118 @@
-import google.generativeai as genai
+import math
 import os
-import json
+import threading
 import time
-import random
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 # ==============================================================================
-#  LUMA ORACLE v2.5 [FAIL-OPEN EDITION]
+#  LUMA ORACLE v3.0 [ASYNC FAIL-OPEN EDITION]
 #  Logic: If AI is online -> Use AI Advice.
 #         If AI is busy   -> BYPASS AND TRADE (Trust Technicals).
+#  Consultations run on worker threads with a deadline; verdicts are cached by
+#  (coin, setup, price bucket) and identical in-flight questions share one call.
 # ==============================================================================
 
+TIMEOUT_POLICIES = ("allow", "block", "wait")
+
 class Oracle:
-    def __init__(self):
+    def __init__(self, model=None, deadline=3.0, on_timeout="allow", ttl=300.0,
+                 price_bucket=0.005, min_interval=2.0, workers=4):
+        """
+        model: anything with generate_content(prompt) -> obj with .text (injectable; Gemini by default)
+        deadline: seconds consult() waits before applying `on_timeout`
+        on_timeout: "allow" (trade), "block" (skip) or "wait" (block until the verdict)
+        ttl / price_bucket: verdict cache lifetime and price granularity (0.005 = 0.5% buckets)
+        min_interval: client-side spacing between model calls (enforced on the workers)
+        """
+        if on_timeout not in TIMEOUT_POLICIES: raise ValueError(f"on_timeout must be one of {TIMEOUT_POLICIES}")
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.model = None
-        self.last_call = 0
+        self.model = model
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+        self.ttl = ttl
+        self.price_bucket = price_bucket
+        self.min_interval = min_interval
         self.failures = 0
-        
+
         # [CONFIGURATION]
         # If True, we trade even if the AI is broken/busy.
         self.FAIL_OPEN = True
-        
-        if self.api_key:
+
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="oracle")
+        self.lock = threading.Lock()
+        self.cache = {}    # key -> (verdict, expires_at)
+        self.inflight = {} # key -> Future
+        self.next_slot = 0.0
+        self.stats = {"calls": 0, "cache_hits": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+        if self.model is None and self.api_key:
             try:
+                import google.generativeai as genai # Only needed for the real model
                 genai.configure(api_key=self.api_key)
                 self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            except:
+            except Exception:
                 print("xx ORACLE INIT FAILED. Running in Bypass Mode.")
 
-    def consult(self, coin, setup_type, price, context):
-        # 1. Check if configured
+    # --- PUBLIC ---
+    def consult(self, coin, setup_type, price, context, deadline=None):
+        """True = trade, False = blocked. Never waits longer than the deadline (unless policy is "wait")."""
         if not self.model:
             return True # Bypass if no key
-            
-        # 2. Rate Limit Throttling (Client Side)
-        elapsed = time.time() - self.last_call
-        if elapsed < 2.0:
-            time.sleep(2.0 - elapsed)
+        future = self.consult_async(coin, setup_type, price, context)
+        try:
+            return future.result(timeout=self.deadline if deadline is None else deadline)
+        except FutureTimeout:
+            with self.lock: self.stats['timeouts'] += 1
+            if self.on_timeout == "wait": return future.result()
+            allow = self.on_timeout == "allow"
+            print(f">> ⏱️ ORACLE DEADLINE: {coin} -> {'EXECUTE' if allow else 'SKIP'} (verdict will be cached)")
+            return allow
+
+    def consult_async(self, coin, setup_type, price, context):
+        """Future resolving to the verdict. Cached and in-flight questions are shared."""
+        key = self._key(coin, setup_type, price)
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached and cached[1] > time.time():
+                self.stats['cache_hits'] += 1
+                return _done(cached[0])
+            future = self.inflight.get(key)
+            if future:
+                self.stats['coalesced'] += 1
+                return future
+            future = self.pool.submit(self._ask, key, coin, setup_type, price, context)
+            self.inflight[key] = future
+            return future
+
+    # --- INTERNALS ---
+    def _key(self, coin, setup_type, price):
+        price = float(price)
+        bucket = round(math.log(price) / math.log1p(self.price_bucket)) if price > 0 else 0
+        return (coin, str(setup_type), bucket)
+
+    def _throttle(self):
+        """Reserves the next call slot (client-side rate limit) and sleeps until it, on the worker."""
+        with self.lock:
+            slot = max(time.time(), self.next_slot)
+            self.next_slot = slot + self.min_interval
+        wait = slot - time.time()
+        if wait > 0: time.sleep(wait)
 
+    def _ask(self, key, coin, setup_type, price, context):
+        try:
+            verdict, cacheable = self._call_model(coin, setup_type, price, context)
+            with self.lock:
+                if cacheable:
+                    now = time.time()
+                    self.cache = {k: v for k, v in self.cache.items() if v[1] > now}
+                    self.cache[key] = (verdict, now + self.ttl)
+            return verdict
+        finally:
+            with self.lock: self.inflight.pop(key, None)
+
+    def _call_model(self, coin, setup_type, price, context):
+        """(verdict, cacheable). Errors fail open and are not cached."""
+        self._throttle()
         try:
             # 3. Construct the Prompt
             prompt = f"""
@@ -51,34 +126,42 @@ class Oracle:
             Output: Respond with exactly ONE word: 'YES' or 'NO'.
             Logic: If the setup is technically sound (even slightly), say YES. Only say NO if it is an obvious error.
             """
-            
+
             # 4. The API Call
+            with self.lock: self.stats['calls'] += 1
             response = self.model.generate_content(prompt)
-            self.last_call = time.time()
             self.failures = 0
-            
+
             clean_response = response.text.strip().upper()
 
             if "YES" in clean_response:
-                return True
+                return True, True
             elif "NO" in clean_response:
                 print(f">> 🛡️ ORACLE: Blocked {coin} (AI Rejected Setup)")
-                return False
+                return False, True
             else:
-                return True # Ambiguous response -> Allow Trade
-            
+                return True, True # Ambiguous response -> Allow Trade
+
         except Exception as e:
+            self.failures += 1
+            with self.lock: self.stats['errors'] += 1
             # 5. THE CRITICAL FIX: HANDLE RATE LIMITS
             error_msg = str(e).lower()
-            
+
             # If Rate Limit (429) -> ALLOW THE TRADE
             if "429" in error_msg or "quota" in error_msg or "rate limit" in error_msg:
                 if self.FAIL_OPEN:
                     print(f">> ⚡ ORACLE BUSY (Rate Limit). BYPASSING -> EXECUTE TRADE.")
-                    return True
+                    return True, False
                 else:
-                    return False
-            
+                    return False, False
+
             # Handle other errors (Network, etc) -> ALLOW TRADE
             print(f">> ⚠️ ORACLE ERROR: {e}. Bypassing check.")
-            return True
+            return True, False
+
+def _done(value):
+    """Already-resolved Future (cache hits share the async interface)."""
+    f = Future()
+    f.set_result(value)
+    return f
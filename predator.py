@@ -1,14 +1,16 @@
+import indicators
+
 class Predator:
     def __init__(self):
         print(">> Predator (Patient Hunter) Loaded [HYBRID RSI SYNC]")
 
-    def analyze_divergence(self, candles, coin="UNKNOWN"):
+    def analyze_divergence(self, candles, coin="UNKNOWN", ind=None):
         try:
             if len(candles) < 15: return None
+            if ind is None: ind = indicators.snapshot(candles)
             curr = candles[-1]
             prev = candles[-2]
-            closes = [float(c['c']) for c in candles]
-            rsi = self._calculate_rsi(closes)
+            rsi = ind['rsi']
 
             if curr['c'] < prev['l'] and curr['v'] > (prev['v'] * 1.5) and rsi < 50:
                 return "ABSORPTION_BUY"
@@ -30,17 +32,3 @@ class Predator:
                 else: return "REAL_DUMP"
         except: pass
         return None
-
-    def _calculate_rsi(self, prices, period=14):
-        try:
-            if len(prices) < period + 1: return 50
-            deltas = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
-            recent_deltas = deltas[-period:]
-            gains = [x if x > 0 else 0 for x in recent_deltas]
-            losses = [abs(x) if x < 0 else 0 for x in recent_deltas]
-            avg_gain = sum(gains) / period
-            avg_loss = sum(losses) / period
-            if avg_loss == 0: return 100
-            rs = avg_gain / avg_loss
-            return 100 - (100 / (1 + rs))
-        except: return 50
@@ -0,0 +1,168 @@
+import json
+import time
+import threading
+import websocket
+
+class Retina:
+    """
+    Live market-data stream (Hyperliquid WebSocket).
+    Keeps an in-memory view of mids, candles and the account state.
+    Vision reads from it while it is fresh and falls back to REST when it is not.
+    """
+    def __init__(self, url="wss://api.hyperliquid.xyz/ws", stale_after=10.0, ping_every=30.0):
+        print(">> Retina (Live Stream) Loaded")
+        self.url = url
+        self.stale_after = stale_after
+        self.ping_every = ping_every
+
+        self.lock = threading.Lock()
+        self.subscriptions = []
+        self.listeners = {"candle": [], "allMids": [], "user": [], "connection": []}
+
+        # Live View
+        self.mids = {}
+        self.user = None
+        self.user_state = None
+        self.user_state_at = 0.0 # When user_state arrived
+        self.seen = set() # Channels/keys that delivered data on the current connection
+
+        self.ws = None
+        self.connected = False
+        self.running = False
+        self.last_msg = 0.0
+        self.thread = None
+
+    # --- SUBSCRIPTIONS ---
+    def subscribe_mids(self):
+        self._subscribe({"type": "allMids"})
+
+    def subscribe_candles(self, coin, interval):
+        self._subscribe({"type": "candle", "coin": coin, "interval": interval})
+
+    def subscribe_user(self, address):
+        if not address: return
+        self.user = address
+        self._subscribe({"type": "webData2", "user": address})
+
+    def _subscribe(self, sub):
+        with self.lock:
+            if sub in self.subscriptions: return
+            self.subscriptions.append(sub)
+            ws = self.ws if self.connected else None
+        if ws: self._send(ws, {"method": "subscribe", "subscription": sub})
+
+    def on(self, channel, callback):
+        """Registers a callback for 'candle', 'allMids' or 'user' updates, or 'connection' ("open"/"closed")."""
+        self.listeners[channel].append(callback)
+
+    # --- FRESHNESS ---
+    def is_fresh(self, key=None):
+        """True if the socket is alive and `key` has delivered data on this connection."""
+        if not self.connected: return False
+        if time.time() - self.last_msg > self.stale_after: return False
+        return key is None or key in self.seen
+
+    # --- LIFECYCLE ---
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="retina", daemon=True)
+        self.thread.start()
+        threading.Thread(target=self._keepalive, name="retina-ping", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        ws = self.ws
+        if ws:
+            try: ws.close()
+            except: pass
+
+    def _run(self):
+        backoff = 1.0
+        while self.running:
+            started = time.time()
+            try:
+                self.ws = websocket.WebSocketApp(
+                    self.url,
+                    on_open=self._on_open,
+                    on_message=self._on_message,
+                    on_close=self._on_close,
+                    on_error=self._on_error
+                )
+                self.ws.run_forever()
+            except Exception as e:
+                print(f"xx RETINA ERROR: {e}")
+            if self.connected: self._on_close(self.ws) # Dropped without a close callback
+            if not self.running: break
+            # Reset backoff after a healthy session
+            if time.time() - started > 60: backoff = 1.0
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _keepalive(self):
+        # Hyperliquid drops sockets that are silent for 60s
+        while self.running:
+            time.sleep(self.ping_every)
+            if self.connected and self.ws:
+                self._send(self.ws, {"method": "ping"})
+
+    def _send(self, ws, msg):
+        try: ws.send(json.dumps(msg))
+        except Exception as e: print(f"xx RETINA SEND FAILED: {e}")
+
+    # --- SOCKET CALLBACKS ---
+    def _on_open(self, ws):
+        with self.lock:
+            self.seen = set()
+            self.connected = True
+            self.last_msg = time.time()
+            subs = list(self.subscriptions)
+        print(f">> RETINA CONNECTED ({len(subs)} channels)")
+        self._emit("connection", "open")
+        for sub in subs:
+            self._send(ws, {"method": "subscribe", "subscription": sub})
+
+    def _on_close(self, ws, code=None, reason=None):
+        self.connected = False
+        self.seen = set()
+        print(f">> RETINA DISCONNECTED ({code})")
+        self._emit("connection", "closed")
+
+    def _on_error(self, ws, error):
+        print(f"xx RETINA SOCKET ERROR: {error}")
+
+    def _on_message(self, ws, raw):
+        self.last_msg = time.time()
+        try:
+            msg = json.loads(raw)
+        except Exception:
+            return
+        channel = msg.get("channel")
+        data = msg.get("data")
+        if not data: return
+
+        try:
+            if channel == "allMids":
+                self.mids = dict(data.get("mids", {}))
+                self.seen.add("allMids")
+                self._emit("allMids", self.mids)
+
+            elif channel == "candle":
+                key = (data.get("s"), data.get("i"))
+                self.seen.add(key)
+                self._emit("candle", data)
+
+            elif channel == "webData2":
+                state = data.get("clearinghouseState")
+                if state is not None and data.get("user", self.user) == self.user:
+                    self.user_state = state
+                    self.user_state_at = time.time()
+                    self.seen.add("user")
+                    self._emit("user", state)
+        except Exception as e:
+            print(f"xx RETINA PARSE ERROR ({channel}): {e}")
+
+    def _emit(self, channel, payload):
+        for callback in self.listeners[channel]:
+            try: callback(payload)
+            except Exception as e: print(f"xx RETINA LISTENER ERROR ({channel}): {e}")
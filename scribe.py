@@ -0,0 +1,127 @@
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+class Scribe:
+    """
+    Background log sink for the permanent record (system.log).
+    log() only enqueues; a writer thread batches records into JSON lines,
+    flushes at most every `flush_every` seconds, and rotates the file by size
+    or age into gzipped archives (system-<timestamp>.log.gz), keeping the
+    newest `keep`. If the queue is full the record is dropped and counted
+    rather than blocking the caller.
+    """
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, rotate_every=24 * 3600,
+                 keep=60, flush_every=1.0, max_queue=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_every = rotate_every
+        self.keep = keep
+        self.flush_every = flush_every
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.opened_at = self._segment_start() # Age-based rotation survives redeploys
+        self.thread = threading.Thread(target=self._writer, name="scribe", daemon=True)
+        self.thread.start()
+
+    def _segment_start(self):
+        """When the live file was started: the timestamp of its first record (now if none)."""
+        try:
+            with open(self.path, 'r', encoding="utf-8", errors="replace") as f:
+                return _epoch(json.loads(f.readline())['ts'])
+        except Exception:
+            return time.time()
+
+    def log(self, message, **fields):
+        record = {"ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "msg": message}
+        record.update({k: v for k, v in fields.items() if v is not None})
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    # --- WRITER ---
+    def _writer(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.flush_every
+            while len(batch) < 1000:
+                try: batch.append(self.queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty: break
+            taken = len(batch)
+            self._write(batch)
+            for _ in range(taken): self.queue.task_done()
+
+    def _write(self, batch):
+        if self.dropped:
+            batch.append({"ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "msg": f"SCRIBE DROPPED {self.dropped} RECORDS", "level": "warn"})
+            self.dropped = 0
+        try:
+            self._maybe_rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, default=str, ensure_ascii=False) + "\n" for r in batch))
+        except Exception as e:
+            print(f"xx SCRIBE WRITE ERROR: {e}")
+
+    def _maybe_rotate(self):
+        if not os.path.exists(self.path):
+            self.opened_at = time.time()
+            return
+        too_big = os.path.getsize(self.path) >= self.max_bytes
+        too_old = time.time() - self.opened_at >= self.rotate_every
+        if not (too_big or too_old): return
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}-{stamp}{ext}"
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        self.opened_at = time.time()
+
+        for old in self.archives()[:-self.keep]:
+            try: os.remove(old)
+            except OSError: pass
+
+    def flush(self, timeout=5.0):
+        """Waits (bounded) for queued records to reach disk (shutdown)."""
+        end = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < end: time.sleep(0.05)
+
+    # --- READ ---
+    def archives(self):
+        """Rotated archives, oldest first."""
+        base, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{base}-*{ext}.gz"))
+
+    def search(self, text=None, since=None, **fields):
+        """
+        Streams records (oldest first) across archives and the live file.
+        since: "YYYY-mm-dd[ HH:MM:SS]" prefix-comparable timestamp.
+        fields: exact matches, e.g. coin="SOL".
+        """
+        for path in self.archives() + [self.path]:
+            if since and path != self.path and os.path.getmtime(path) < _epoch(since): continue
+            opener = gzip.open if path.endswith(".gz") else open
+            try:
+                with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        if text and text not in line: continue
+                        try: record = json.loads(line)
+                        except ValueError: continue
+                        if since and record.get("ts", "") < since: continue
+                        if any(record.get(k) != v for k, v in fields.items()): continue
+                        yield record
+            except OSError:
+                continue
+
+def _epoch(ts):
+    fmt = "%Y-%m-%d %H:%M:%S" if len(ts) > 10 else "%Y-%m-%d"
+    return time.mktime(datetime.strptime(ts, fmt).timetuple())
@@ -1,15 +1,16 @@
 import pandas as pd
+import indicators
 
 class SmartMoney:
     def __init__(self):
         print(">> Smart Money (FULL ARSENAL: PRINCE, MEME & GHOSTS) Loaded")
 
-    def calculate_position_size(self, total_equity, active_positions_count=0):
+    def calculate_position_size(self, total_equity, active_positions_count=0, slots=6):
         """
         TIER 1 (Financial Logic): 
         - 30% Safety Net (Untouchable)
         - 70% Active Trading Capital
-        - Split evenly among the 6 Fleet Coins (approx 11.6% per coin)
+        - Split evenly among the Fleet Coins (6 slots = approx 11.6% per coin)
         """
         if total_equity <= 0: return 0.0
         
@@ -17,10 +18,10 @@ class SmartMoney:
         safe_net = total_equity * 0.30
         tradeable_equity = total_equity * 0.70
         
-        # 2. Allocation per Coin (Fixed to 6 slots: SOL, SUI, BNB, WIF, DOGE, PENGU)
-        # We divide the total tradeable equity by 6, regardless of how many are currently open.
+        # 2. Allocation per Coin (One slot per Fleet Coin)
+        # We divide the total tradeable equity by the fleet size, regardless of how many are currently open.
         # This ensures we never over-allocate if we add more coins later.
-        allocation_per_coin = tradeable_equity / 6.0
+        allocation_per_coin = tradeable_equity / float(max(slots, 1))
         
         # Safety check: Ensure we don't return tiny dust amounts
         if allocation_per_coin < 5.0: return 0.0
@@ -54,20 +55,19 @@ class SmartMoney:
         except: pass
         return None
 
-    def hunt_turtle(self, candles, coin_type="MEME"):
+    def hunt_turtle(self, candles, coin_type="MEME", ind=None):
         # TIER 286: HYBRID STRUCTURE HUNTER
+        # `ind`: precomputed indicators.snapshot(candles) (computed here if missing)
         try:
             if len(candles) < 55: return None
+            if ind is None: ind = indicators.snapshot(candles)
             
-            closes = [float(c['c']) for c in candles]
-            volumes = [float(c['v']) for c in candles]
-            current_price = closes[-1]
-
-            ema_50 = self._calculate_ema(closes, 50)
-            rsi = self._calculate_rsi(closes)
+            current_price = ind['price']
+            ema_50 = ind['ema_50']
+            rsi = ind['rsi']
             
-            curr_vol = volumes[-1]
-            avg_vol = sum(volumes[-11:-1]) / 10
+            curr_vol = float(candles[-1]['v'])
+            avg_vol = ind['vol_avg']
             vol_spike = curr_vol > (avg_vol * 1.5)
 
             # --- STRATEGY A: THE "PRINCE" PLAY (Strict Structure) ---
@@ -100,26 +100,3 @@ class SmartMoney:
         
         except Exception as e: pass
         return None
-
-    def _calculate_rsi(self, prices, period=14):
-        try:
-            if len(prices) < period + 1: return 50
-            deltas = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
-            recent = deltas[-period:]
-            gains = [x for x in recent if x > 0]
-            losses = [abs(x) for x in recent if x < 0]
-            avg_gain = sum(gains)/period if gains else 0
-            avg_loss = sum(losses)/period if losses else 0
-            if avg_loss == 0: return 100
-            rs = avg_gain / avg_loss
-            return 100 - (100 / (1 + rs))
-        except: return 50
-
-    def _calculate_ema(self, prices, period):
-        try:
-            k = 2 / (period + 1)
-            ema = prices[0]
-            for p in prices[1:]:
-                ema = (p * k) + (ema * (1 - k))
-            return ema
-        except: return prices[-1]
@@ -0,0 +1,216 @@
+import bisect
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Log-spaced latency buckets (ms); anything slower lands in the overflow bucket
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+def _pick(ordered, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not ordered: return 0.0
+    return round(ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)], 1)
+
+class Histogram:
+    """
+    Latency histogram: fixed bucket counts for the shape, plus a bounded
+    reservoir of recent samples for p50/p95/p99.
+    """
+    def __init__(self, name, window=1024):
+        self.name = name
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, ms):
+        with self.lock:
+            self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+            self.samples.append(ms)
+            self.count += 1
+            self.total += ms
+            self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        with self.lock:
+            ordered = sorted(self.samples)
+        return _pick(ordered, q)
+
+    def snapshot(self):
+        with self.lock:
+            ordered = sorted(self.samples)
+            counts = list(self.counts)
+            count, total, peak = self.count, self.total, self.max
+        labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {
+            "count": count,
+            "avg": round(total / count, 1) if count else 0.0,
+            "max": round(peak, 1),
+            "p50": _pick(ordered, 50), "p95": _pick(ordered, 95), "p99": _pick(ordered, 99),
+            "buckets": {label: n for label, n in zip(labels, counts) if n},
+        }
+
+class Registry:
+    """
+    Named histograms (ms), counters and gauges shared by every organ.
+    span(name) times a block into the histogram of the same name. A background
+    exporter writes snapshot() to metrics.json; serve() exposes the same JSON
+    on a localhost port. Recording is a dict lookup plus a locked append, so it
+    is cheap enough for hot paths.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.profiler = None
+
+    def histogram(self, name):
+        h = self.histograms.get(name)
+        if h is None:
+            with self.lock:
+                h = self.histograms.setdefault(name, Histogram(name))
+        return h
+
+    def observe(self, name, ms):
+        self.histogram(name).observe(ms)
+
+    def incr(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        snap = {
+            "generated_at": round(time.time(), 3),
+            "uptime_s": round(time.time() - self.started, 1),
+            "spans": {name: h.snapshot() for name, h in sorted(histograms.items())},
+            "counters": dict(sorted(counters.items())),
+            "gauges": dict(self.gauges),
+        }
+        if self.profiler: snap["profile"] = self.profiler.snapshot()
+        return snap
+
+    # --- EXPORT ---
+    def start_exporter(self, path, every=5.0, profile_flag=None):
+        """
+        Writes metrics.json every `every` seconds (atomic replace).
+        profile_flag: path of a file whose presence turns the sampling profiler on
+        (touch it to start profiling a live process, delete it to stop).
+        """
+        def loop():
+            while True:
+                time.sleep(every)
+                if profile_flag: self._toggle_profiler(os.path.exists(profile_flag))
+                try:
+                    temp = path + ".tmp"
+                    with open(temp, "w") as f: json.dump(self.snapshot(), f)
+                    os.replace(temp, path)
+                except Exception as e:
+                    print(f"xx METRICS EXPORT ERROR: {e}")
+        threading.Thread(target=loop, name="metrics", daemon=True).start()
+
+    def serve(self, port, host="127.0.0.1"):
+        """JSON snapshot at http://host:port/metrics (localhost only by default)."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = json.dumps(registry.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f">> TELEMETRY: Metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    def _toggle_profiler(self, on):
+        if on and not (self.profiler and self.profiler.running):
+            self.profiler = SamplingProfiler()
+            self.profiler.start()
+            print(">> TELEMETRY: Sampling profiler ON")
+        elif not on and self.profiler and self.profiler.running:
+            self.profiler.stop()
+            print(">> TELEMETRY: Sampling profiler OFF")
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler: every `interval` seconds it records
+    where each thread is (innermost frame and its caller). Costs one
+    sys._current_frames() call per sample; nothing is traced.
+    """
+    def __init__(self, interval=0.01, top=25):
+        self.interval = interval
+        self.top = top
+        self.samples = Counter()
+        self.total = 0
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._loop, name="profiler", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _loop(self):
+        me = threading.get_ident()
+        names = {}
+        while self.running:
+            for t in threading.enumerate(): names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me: continue
+                where = f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}"
+                caller = frame.f_back
+                if caller: where += f" <- {caller.f_code.co_name}"
+                with self.lock:
+                    self.samples[(names.get(ident, "?"), where)] += 1
+                    self.total += 1
+            time.sleep(self.interval)
+
+    def snapshot(self):
+        with self.lock:
+            total = self.total
+            top = self.samples.most_common(self.top)
+        return {
+            "running": self.running,
+            "samples": total,
+            "top": [{"thread": thread, "where": where, "pct": round(n / total * 100, 1)} for (thread, where), n in top],
+        }
+
+# Process-wide registry
+METRICS = Registry()
@@ -1,13 +1,137 @@
 import json
 import time
+import random
+import threading
+import numpy as np
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
 import logging
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from candles import Candles
+from telemetry import METRICS
 
-class Vision:
+# Hyperliquid info endpoint: 1200 weight per minute per IP.
+# Light endpoints weigh 2, everything else 20; candleSnapshot adds 1 per 60 bars returned.
+INFO_WEIGHT_PER_MIN = 1200
+INFO_WEIGHTS = {"allMids": 2, "clearinghouseState": 2, "l2Book": 2, "orderStatus": 2,
+                "spotClearinghouseState": 2, "exchangeStatus": 2}
+DEFAULT_WEIGHT = 20
+CANDLE_ITEMS_PER_WEIGHT = 60
+
+def info_weight(endpoint):
+    return INFO_WEIGHTS.get(endpoint, DEFAULT_WEIGHT)
+
+class RateBudget:
+    """
+    Weight-based token bucket shared by every thread that talks to the info endpoint.
+    Keeps the concurrent scanner under Hyperliquid's per-IP weight limit.
+    rate: weight per second; burst: bucket size in weight.
+    """
+    def __init__(self, rate=INFO_WEIGHT_PER_MIN / 60, burst=200):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def acquire(self, cost=1.0):
+        """Blocks until `cost` weight is available, then spends it."""
+        cost = min(float(cost), self.capacity) # A single call never waits forever
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def spend(self, cost):
+        """Charges weight known only after the response (may go negative: later callers wait)."""
+        if cost <= 0: return
+        with self.lock:
+            self._refill()
+            self.tokens -= cost
+
+    def period(self, cost, share=1.0):
+        """Seconds between repeats of a `cost`-weight job that may use `share` of the budget."""
+        return cost / (self.rate * share)
+
+class PriceCache:
+    """
+    Latest mid prices with the time each one was seen.
+    Fed by REST allMids and the live stream; read by Hands and DeepSea.
+    """
     def __init__(self):
+        self.prices = {} # coin -> (price, timestamp)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock) # Wakes price-driven loops (DeepSea)
+
+    def update(self, mids):
+        now = time.time()
+        with self.lock:
+            for coin, px in mids.items():
+                try: self.prices[coin] = (float(px), now)
+                except (TypeError, ValueError): pass
+            self.changed.notify_all()
+
+    def set(self, coin, price):
+        with self.lock:
+            self.prices[coin] = (float(price), time.time())
+            self.changed.notify_all()
+
+    def wait(self, timeout):
+        """Blocks until the next price update or `timeout` seconds."""
+        with self.lock:
+            return self.changed.wait(timeout)
+
+    def get(self, coin, max_age=None):
+        """Price if known and not older than `max_age` seconds, else None."""
+        with self.lock:
+            entry = self.prices.get(coin)
+        if not entry: return None
+        px, stamp = entry
+        if max_age is not None and time.time() - stamp > max_age: return None
+        return px
+
+class Vision:
+    def __init__(self, rate_limit=INFO_WEIGHT_PER_MIN / 60, burst=200, max_candles=500,
+                 pool_connections=4, pool_maxsize=16, timeout=10,
+                 backoff_base=0.5, backoff_cap=8.0, fetch_workers=8, archive=None):
         print(">> Vision Module (v3.5: OPTIMIZED REQUESTS) Loaded")
         self.base_url = "https://api.hyperliquid.xyz/info"
+        # Persistent keep-alive session (one TLS handshake per pooled socket)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # Rolling candle store: (coin, interval) -> Candles (columnar, oldest first)
         self.cache = {}
+        self.cache_lock = threading.Lock()
+        self.max_candles = max_candles
+        # Optional on-disk CandleArchive: seeds the store on cold start, receives closed bars
+        self.archive = archive
+        # Shared across scanner threads (weight/second, see INFO_WEIGHTS)
+        self.budget = RateBudget(rate_limit, burst)
+        # Bulk fetch pool + in-flight requests (coalesced per key)
+        self.fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="vision")
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+        # Shared mid-price cache (REST + stream)
+        self.mids = PriceCache()
+        # Optional live stream (Retina); REST is the fallback
+        self.stream = None
+        self.stream_synced = set() # Store keys that the stream keeps gap-free
         # Map intervals to milliseconds for accurate math
         self.interval_map = {
             "1m": 60 * 1000,
@@ -21,61 +145,242 @@ class Vision:
 
     def _post(self, payload, retries=3):
         """Robust POST with retries for network blips."""
+        endpoint = payload.get("type", "unknown")
         for attempt in range(retries):
+            self.budget.acquire(info_weight(endpoint))
+            delay = self._backoff(attempt)
+            started = time.monotonic()
             try:
-                headers = {"Content-Type": "application/json"}
-                # Timeout increased slightly to 10s for stability
-                resp = requests.post(self.base_url, json=payload, headers=headers, timeout=10)
+                resp = self.session.post(self.base_url, json=payload, timeout=self.timeout)
+                self._record(endpoint, time.monotonic() - started, ok=(resp.status_code == 200))
                 
                 if resp.status_code == 200:
-                    return resp.json()
+                    data = resp.json()
+                    if endpoint == "candleSnapshot" and isinstance(data, list):
+                        self.budget.spend(len(data) // CANDLE_ITEMS_PER_WEIGHT)
+                    return data
                 elif resp.status_code == 429:
-                    print(f"xx RATE LIMIT (Attempt {attempt+1}) - Sleeping 2s...")
-                    time.sleep(2)
+                    self._record(endpoint, rate_limited=True)
+                    delay = self._retry_after(resp) or delay
+                    print(f"xx RATE LIMIT {endpoint} (Attempt {attempt+1}) - Sleeping {delay:.1f}s...")
+                elif resp.status_code < 500:
+                    # Client errors won't fix themselves on retry
+                    print(f"xx API ERROR: {resp.status_code} - {resp.text[:50]}")
+                    return None
                 else:
                     # Log non-200 errors but don't crash
                     if attempt == retries - 1:
                         print(f"xx API ERROR: {resp.status_code} - {resp.text[:50]}")
                         
             except requests.exceptions.RequestException as e:
+                self._record(endpoint, time.monotonic() - started, ok=False)
                 print(f"xx NETWORK ERROR (Attempt {attempt+1}): {e}")
-                time.sleep(1)
             except Exception as e:
                 print(f"xx UNKNOWN VISION ERROR: {e}")
+                return None
+
+            if attempt < retries - 1:
+                self._record(endpoint, retried=True)
+                time.sleep(delay)
         
         return None
 
+    def _backoff(self, attempt):
+        """Exponential backoff with jitter (half fixed, half random)."""
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _retry_after(self, resp):
+        """Parses a Retry-After header (seconds or HTTP date)."""
+        value = resp.headers.get("Retry-After")
+        if not value: return None
+        try:
+            return min(float(value), 60.0)
+        except ValueError:
+            pass
+        try:
+            wait = parsedate_to_datetime(value).timestamp() - time.time()
+            return min(max(wait, 0.0), 60.0)
+        except Exception:
+            return None
+
+    def _record(self, endpoint, latency=None, ok=True, retried=False, rate_limited=False):
+        """Per-endpoint latency histogram + counters in the shared telemetry registry."""
+        name = f"http.{endpoint}"
+        if latency is not None:
+            METRICS.observe(name, latency * 1000)
+            if not ok: METRICS.incr(f"{name}.errors")
+        if retried: METRICS.incr(f"{name}.retries")
+        if rate_limited: METRICS.incr(f"{name}.rate_limited")
+
+    def get_endpoint_stats(self):
+        """Snapshot of per-endpoint counters with latency percentiles."""
+        snap = METRICS.snapshot()
+        out = {}
+        for name, h in snap["spans"].items():
+            if not name.startswith("http."): continue
+            out[name[5:]] = {
+                "calls": h["count"],
+                "errors": snap["counters"].get(f"{name}.errors", 0),
+                "retries": snap["counters"].get(f"{name}.retries", 0),
+                "rate_limited": snap["counters"].get(f"{name}.rate_limited", 0),
+                "latency_ms_avg": h["avg"], "latency_ms_max": h["max"],
+                "latency_ms_p50": h["p50"], "latency_ms_p95": h["p95"], "latency_ms_p99": h["p99"],
+            }
+        return out
+
+    def attach_stream(self, retina):
+        """Reads from a live Retina stream while it is fresh (REST otherwise)."""
+        self.stream = retina
+        retina.on("candle", self._on_stream_candle)
+        retina.on("allMids", self.mids.update)
+        retina.on("connection", self._on_stream_connection)
+
+    def _on_stream_connection(self, state):
+        """
+        Bars streamed across a drop/reconnect may have missed trades, so no key is
+        trusted again until a REST catch-up from its last stored bar re-syncs it.
+        """
+        self.stream_synced.clear()
+
+    def _on_stream_candle(self, raw):
+        """Merges a streamed bar into the store if it continues the stored series."""
+        key = (raw.get('s'), raw.get('i'))
+        if key not in self.stream_synced: return
+        ms_per_candle = self.interval_map.get(key[1], 3600000)
+        with self.cache_lock:
+            stored = self.cache.get(key)
+            last_t = int(stored.t[-1]) if stored else None
+        if last_t is None or raw['t'] < last_t: return
+        if raw['t'] > last_t + ms_per_candle:
+            # Gap (missed bars) -> let REST repair it
+            self.stream_synced.discard(key)
+            return
+        self._merge_candles(key, Candles.from_rows([raw]))
+
+    def user_stream_live(self, address):
+        """True while user state for `address` is arriving over the websocket."""
+        return bool(address and self.stream and self.stream.user == address and self.stream.is_fresh("user"))
+
     def get_user_state(self, address):
         """Fetches account Equity and Positions."""
         if not address: return {}
+        if self.user_stream_live(address):
+            return self.stream.user_state or {}
         payload = {"type": "clearinghouseState", "user": address}
         return self._post(payload) or {}
 
+    @staticmethod
+    def parse_positions(acct):
+        """Open positions from a clearinghouse state: [{coin, size, entry, pnl, margin}]."""
+        positions = []
+        for p in (acct or {}).get("assetPositions", []):
+            pos = p.get("position", {})
+            sz = float(pos.get("szi", 0))
+            if sz != 0:
+                positions.append({
+                    "coin": pos.get("coin"),
+                    "size": sz,
+                    "entry": float(pos.get("entryPx", 0)),
+                    "pnl": float(pos.get("unrealizedPnl", 0)),
+                    "margin": float(pos.get("marginUsed", 0.0)) # Direct API value (no calculation)
+                })
+        return positions
+
     def get_global_prices(self):
         """Fetches all mid prices."""
+        if self.stream and self.stream.is_fresh("allMids"):
+            return dict(self.stream.mids)
         payload = {"type": "allMids"}
-        return self._post(payload) or {}
+        prices = self._post(payload) or {}
+        if prices: self.mids.update(prices)
+        return prices
+
+    def _window_size(self, interval):
+        """Number of candles the organs expect for an interval."""
+        # Logic Lock: 70 candles (Safety buffer for EMA 50)
+        # Special Case: Historian logic needs 250 Daily candles
+        if interval == "1d": return 250
+        return 70
 
     def get_candles(self, coin, interval):
         """
-        Fetches OHLCV data.
-        FIXED: Dynamically calculates start time based on the actual interval.
+        Fetches OHLCV data. Concurrent calls for the same (coin, interval)
+        share a single request.
+        """
+        key = (coin, interval)
+        with self.inflight_lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+        if not owner:
+            return future.result()
+
+        candles = Candles.empty()
+        try:
+            candles = self._fetch_candles(coin, interval)
+        finally:
+            with self.inflight_lock:
+                self.inflight.pop(key, None)
+            future.set_result(candles)
+        return candles
+
+    def get_candles_bulk(self, pairs, timeout=None):
+        """
+        Fetches many (coin, interval) pairs concurrently in one call.
+        Duplicates are fetched once. Pairs not done by `timeout` come back empty.
+        Returns {(coin, interval): candles}.
         """
+        result = {key: Candles.empty() for key in dict.fromkeys(pairs)}
+        for key, candles in self.iter_candles(result.keys(), timeout=timeout):
+            result[key] = candles
+        return result
+
+    def iter_candles(self, pairs, timeout=None):
+        """Like get_candles_bulk, but yields ((coin, interval), candles) as each one lands."""
+        keys = list(dict.fromkeys(pairs))
+        futures = {self.fetch_pool.submit(self.get_candles, coin, interval): (coin, interval) for coin, interval in keys}
         try:
+            for future in as_completed(futures, timeout=timeout):
+                yield futures[future], future.result()
+        except FutureTimeout:
+            late = [f"{c}/{i}" for f, (c, i) in futures.items() if not f.done()]
+            print(f"xx CANDLE DEADLINE: {', '.join(late)} not ready after {timeout}s")
+
+    def _fetch_candles(self, coin, interval):
+        """
+        Fetches OHLCV data through the rolling candle store.
+        First call backfills the full window; afterwards only the candles since
+        the last stored bar are requested and merged (the still-open bar is replaced).
+        """
+        try:
+            key = (coin, interval)
             end_time = int(time.time() * 1000)
-            
-            # 1. Get Milliseconds per candle from map (Default to 1h if missing)
             ms_per_candle = self.interval_map.get(interval, 3600000)
-            
-            # 2. Logic Lock: Fetch exactly 70 candles (Safety buffer for EMA 50)
-            # 60 was tight, 70 is safer for calculation lag
-            lookback_window = 70 * ms_per_candle
-            
-            # Special Case: Historian logic for Daily candles
-            if interval == "1d":
-                lookback_window = 250 * 24 * 3600 * 1000
+            window = self._window_size(interval)
 
-            start_time = end_time - lookback_window
+            # Live path: the stream keeps the store current
+            if self.stream:
+                self.stream.subscribe_candles(coin, interval)
+                if key in self.stream_synced and self.stream.is_fresh(key):
+                    with self.cache_lock:
+                        stored = self.cache.get(key)
+                    if stored: return stored[-window:]
+
+            with self.cache_lock:
+                stored = self.cache.get(key)
+            if not stored: stored = self._seed_from_archive(key)
+            last_t = int(stored.t[-1]) if stored else None
+
+            # Incremental request if the store is warm, holds a full window & is recent
+            # enough to catch up in one request, else full backfill
+            catch_up = max(window, self.max_candles) * ms_per_candle
+            if last_t is not None and len(stored) >= window and end_time - last_t < catch_up:
+                start_time = last_t
+            else:
+                start_time = end_time - (window * ms_per_candle)
 
             payload = {
                 "type": "candleSnapshot",
@@ -88,28 +393,64 @@ class Vision:
             }
             
             raw_candles = self._post(payload)
-            if not raw_candles: return []
-
-            # Format for Predator/SmartMoney
-            formatted = []
-            for c in raw_candles:
-                formatted.append({
-                    't': c['t'],
-                    'o': float(c['o']),
-                    'h': float(c['h']),
-                    'l': float(c['l']),
-                    'c': float(c['c']),
-                    'v': float(c['v'])
-                })
-            
-            return formatted
+            if not raw_candles: return Candles.empty()
+
+            # Columnar format for Predator/SmartMoney (parsed straight to float64)
+            fresh = Candles.from_rows(raw_candles)
+            merged = self._merge_candles(key, fresh, reset=(start_time != last_t))
+            if self.stream: self.stream_synced.add(key)
+            return merged[-window:]
 
         except Exception as e:
             print(f"xx CANDLE DATA ERROR ({coin}): {e}")
-            return []
+            return Candles.empty()
+
+    def _merge_candles(self, key, fresh, reset=False):
+        """
+        Merges new candles into the store. Stored bars at or after the first
+        fresh bar are replaced; the store is trimmed to `max_candles`.
+        """
+        with self.cache_lock:
+            stored = self.cache.get(key)
+            if not fresh: return stored if stored is not None else Candles.empty()
+            if reset or stored is None: stored = Candles.empty()
+            cut = int(np.searchsorted(stored.t, fresh.t[0], side='left'))
+
+            limit = max(self.max_candles, self._window_size(key[1]))
+            merged = stored[:cut].concat(fresh)[-limit:]
+            self.cache[key] = merged
+
+        if self.archive:
+            try: self.archive.append(key[0], key[1], merged)
+            except Exception as e: print(f"xx ARCHIVE WRITE FAILED ({key[0]}): {e}")
+        return merged
+
+    def _seed_from_archive(self, key):
+        """Cold start: fills the store from the local archive (no API traffic)."""
+        if not self.archive: return None
+        try:
+            # Newest gap-free run only (a short seed is backfilled by the caller)
+            seed = self.archive.read(key[0], key[1], limit=max(self.max_candles, self._window_size(key[1])), contiguous=True)
+        except Exception as e:
+            print(f"xx ARCHIVE READ FAILED ({key[0]}): {e}")
+            return None
+        if not seed: return None
+        with self.cache_lock:
+            self.cache.setdefault(key, seed)
+            return self.cache[key]
+
+    def evict_candles(self, coin=None, interval=None):
+        """Drops stored candles (all, per coin, per interval, or a single key)."""
+        with self.cache_lock:
+            for key in list(self.cache.keys()):
+                if coin is not None and key[0] != coin: continue
+                if interval is not None and key[1] != interval: continue
+                del self.cache[key]
 
-    def get_price(self, coin):
-        """Quick price lookup helper."""
+    def get_price(self, coin, max_age=2.0):
+        """Quick price lookup helper (cached mid if fresh enough)."""
+        px = self.mids.get(coin, max_age)
+        if px: return px
         prices = self.get_global_prices()
         return float(prices.get(coin, 0))
 